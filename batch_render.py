@@ -0,0 +1,131 @@
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import argparse
+import subprocess
+from multiprocessing import Pool
+from time import perf_counter
+
+import numpy as np
+from matplotlib.image import imsave
+
+"""
+Headless export of the time sweep of Plotting to PNG frames or to a video through ffmpeg.
+The frames are split in contiguous chunks over worker processes, each with its own Plotting figure,
+so that consecutive frames of a chunk only draw the lines added since the previous one.
+
+    python batch_render.py /path/to/run1/ /path/to/run2/ --out-dir frames/ --stride 2 --workers 8
+    python batch_render.py /path/to/run1/ --video sweep.mp4 --fps 25
+"""
+
+# Plotting of the worker process
+plot_object = None
+
+
+def init_worker(data, time_step, plotting_kwargs):
+    """
+    Builds the Plotting of a worker and draws it once, caching the backgrounds for blitting.
+    """
+    global plot_object
+    from single_multiplelines_plotting_v4 import Plotting
+
+    diffdata_list, sample_list, max_slider_val = data
+    plot_object = Plotting(diffdata_list, sample_list, time_step, max_slider_val, blit=True, **plotting_kwargs)
+    plot_object.fig.canvas.draw()
+
+
+def render_frame(frame):
+    """
+
+    :param frame: slider value
+    :return: (height, width, 4) uint8 RGBA array of the figure
+    """
+    plot_object.time_slider.set_val(frame)
+    # the Agg canvas draws (or blits) straight away, the buffer is up to date
+    return np.array(plot_object.fig.canvas.buffer_rgba())
+
+
+def render_png(args):
+    frame, filename = args
+    imsave(filename, render_frame(frame))
+    return filename
+
+
+def ffmpeg_command(filename, width, height, fps):
+    return ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', '%dx%d' % (width, height),
+            '-r', str(fps), '-i', '-', '-pix_fmt', 'yuv420p', filename]
+
+
+def render_sweep(data, frames, out_dir = 'frames', video = None, fps = 25, workers = None, time_step = 1,
+                 plotting_kwargs = {}):
+    """
+
+    :param data: tuple returned by load_data
+    :param frames: slider values to render, in order
+    :param out_dir: directory for frame_<slider value>.png files, created if needed
+    :param video: video file written by ffmpeg, instead of out_dir
+    :param fps: frame rate of the video
+    :param workers: no of processes, all the cores by default
+    :param time_step: as in Plotting
+    :param plotting_kwargs: other keyword arguments of Plotting, e.g. max_lines
+    :return: no of frames rendered
+    """
+    if video is None:
+        if not out_dir:
+            raise ValueError('render_sweep needs out_dir for the frames, or video')
+        os.makedirs(out_dir, exist_ok=True)
+
+    frames = list(frames)
+    workers = workers or os.cpu_count()
+    # a few chunks per worker, contiguous frames in each
+    chunksize = max(1, -(-len(frames)//(workers*4)))
+    start = perf_counter()
+
+    with Pool(workers, initializer=init_worker, initargs=(data, time_step, plotting_kwargs)) as pool:
+        if video is None:
+            jobs = [(frame, os.path.join(out_dir, 'frame_%06d.png' % frame)) for frame in frames]
+            n_frames = len(list(pool.imap(render_png, jobs, chunksize=chunksize)))
+
+        else:
+            ffmpeg = None
+            n_frames = 0
+            # frames come back in order and are piped to ffmpeg as they arrive
+            for image in pool.imap(render_frame, frames, chunksize=chunksize):
+                if ffmpeg is None:
+                    height, width = image.shape[:2]
+                    ffmpeg = subprocess.Popen(ffmpeg_command(video, width, height, fps), stdin=subprocess.PIPE)
+                ffmpeg.stdin.write(image.tobytes())
+                n_frames = n_frames + 1
+
+            if ffmpeg is not None:
+                ffmpeg.stdin.close()
+                ffmpeg.wait()
+
+    elapsed = perf_counter() - start
+    print('Rendered %d frames in %0.1f s (%0.1f frames/s) with %d workers' % (n_frames, elapsed,
+                                                                                n_frames/max(elapsed, 1e-9), workers))
+    return n_frames
+
+
+if __name__=='__main__':
+
+    parser = argparse.ArgumentParser(description='Renders every slider position of Plotting to PNG or video.')
+    parser.add_argument('directories', nargs='+', help='directories ending with /')
+    parser.add_argument('--choice', default='selected_')
+    parser.add_argument('--start', type=int, default=1)
+    parser.add_argument('--stop', type=int, default=None, help='last slider value, the maximum by default')
+    parser.add_argument('--stride', type=int, default=1)
+    parser.add_argument('--time-step', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out-dir', default='frames')
+    parser.add_argument('--video', default=None, help='e.g. sweep.mp4, needs ffmpeg')
+    parser.add_argument('--fps', type=int, default=25)
+    args = parser.parse_args()
+
+    from loading_data_v2 import load_data
+    data = load_data(choice=args.choice, directories=args.directories, container='dataset')
+
+    stop = args.stop if args.stop is not None else data[2]
+    render_sweep(data, range(args.start, stop + 1, args.stride), out_dir=args.out_dir, video=args.video,
+                 fps=args.fps, workers=args.workers, time_step=args.time_step)
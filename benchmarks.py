@@ -0,0 +1,206 @@
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import sys
+import json
+import tempfile
+import argparse
+import platform
+import contextlib
+import tracemalloc
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+"""
+Benchmarks of loading and plotting on synthetic DART runs, under the Agg backend.
+
+    python benchmarks.py --times 2000 --energies 500 --samples 1 3 --out results.json
+
+Scenarios, for each no of samples:
+    load      loading_data_v2.load_data of the runs
+    startup   Plotting.__init__ and the first full draw
+    tick      one slider change, at positions spread over the run
+    sweep     the slider moved through every position in order
+    scale     the Linear/SemiLogY/SemiLogX/LogLog buttons clicked in turn
+Each gives its times in seconds and the peak memory allocated during one run of it (tracemalloc), as JSON.
+"""
+
+SCENARIOS = ('load', 'startup', 'tick', 'sweep', 'scale')
+
+
+def make_run(folder, n_times = 1000, n_energies = 300, name = 'Synthetic', seed = 0, choice = 'selected_'):
+    """
+    Writes a synthetic run in the layout of the DART output: <choice>diff_rpp_rss.npz and <choice>times_thickness.csv.
+
+    :param folder: directory ending with /, created if needed
+    :param n_times: no of time rows
+    :param n_energies: no of energy points
+    :param name: meta_data of the run
+    :param seed: seed of the noise
+    :return: folder
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    times = np.linspace(0, 60, n_times)
+    energies = np.linspace(1.5, 5.0, n_energies)
+    # a few peaks moving and growing with the deposition, plus noise
+    growth = np.linspace(0.1, 1, n_times)[:, None]
+    values = np.zeros((n_times, n_energies), dtype=np.complex128)
+    for centre in rng.uniform(2, 4.5, 3):
+        shift = centre + 0.3*np.sin(times/20)[:, None]
+        values += growth*np.exp(-((energies[None, :] - shift)/0.15)**2)*np.exp(1j*rng.uniform(0, np.pi))
+    values = 1e-3*(values + 0.02*(rng.standard_normal(values.shape) + 1j*rng.standard_normal(values.shape)))
+
+    np.savez_compressed(folder + choice + 'diff_rpp_rss.npz', values=values, index=times, col_names=energies,
+                        index_name='time (min)', meta_data=name)
+    pd.DataFrame({'time (min)': times, 'thickness (nm)': np.linspace(0, 50, n_times)}).to_csv(
+        folder + choice + 'times_thickness.csv', index=False)
+
+    return folder
+
+
+def measure(function, repeat = 1):
+    """
+    Times function over repeat calls, then calls it once more under tracemalloc, whose overhead would
+    distort the times, for the peak memory.
+
+    :return: result of the last call, list of the seconds of each timed call, peak bytes allocated in a call
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        seconds.append(perf_counter() - start)
+
+    tracemalloc.start()
+    result = function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return result, seconds, peak
+
+
+def result(scenario, n_samples, seconds, peak, n_events = 1):
+    """
+    One entry of the results.
+
+    :param n_events: no of slider or button events in each timed call, for the time per event
+    """
+    return {'scenario': scenario, 'samples': n_samples, 'events': n_events, 'seconds': seconds,
+            'median_s': float(np.median(seconds)), 'per_event_ms': 1e3*float(np.median(seconds))/n_events,
+            'peak_mb': peak/2**20}
+
+
+def run_benchmarks(n_times = 1000, n_energies = 300, sample_counts = (1, 3), repeat = 3, workdir = None,
+                   scenarios = SCENARIOS, plotting_kwargs = {}):
+    """
+
+    :param n_times: no of time rows of each synthetic run
+    :param n_energies: no of energy points
+    :param sample_counts: no of samples plotted together, one set of results for each
+    :param repeat: no of times each scenario is timed
+    :param workdir: directory for the synthetic runs, a temporary one by default
+    :param scenarios: names of SCENARIOS to run
+    :param plotting_kwargs: keyword arguments of Plotting, e.g. blit or max_lines
+    :return: dict of the configuration and the list of results
+    """
+    import matplotlib.pyplot as plt
+    from loading_data_v2 import load_data
+    from single_multiplelines_plotting_v4 import Plotting
+
+    tmp = None
+    if workdir is None:
+        tmp = tempfile.TemporaryDirectory()
+        workdir = tmp.name
+    folders = [make_run(os.path.join(workdir, 'run%d' % i) + os.sep, n_times, n_energies, 'Run %d' % i, seed=i)
+               for i in range(max(sample_counts))]
+
+    results = []
+    for n_samples in sample_counts:
+        directories = folders[:n_samples]
+
+        data, seconds, peak = measure(lambda: load_data(directories=directories), repeat)
+        if 'load' in scenarios:
+            results.append(result('load', n_samples, seconds, peak))
+        diffdata_list, sample_list, max_slider_val = data
+
+        def startup():
+            plot_object = Plotting(diffdata_list, sample_list, 1, max_slider_val, **plotting_kwargs)
+            plot_object.fig.canvas.draw()
+            return plot_object
+
+        plot_object, seconds, peak = measure(startup, repeat)
+        if 'startup' in scenarios:
+            results.append(result('startup', n_samples, seconds, peak))
+        slider = plot_object.time_slider
+
+        if 'tick' in scenarios:
+            # jumps back and forth over the run
+            positions = np.linspace(1, max_slider_val, 20).astype(int)[np.r_[0:20:2, 19:0:-2]]
+
+            def ticks():
+                [slider.set_val(i) for i in positions]
+
+            _, seconds, peak = measure(ticks, repeat)
+            results.append(result('tick', n_samples, seconds, peak, len(positions)))
+
+        if 'sweep' in scenarios:
+            def sweep():
+                slider.set_val(0)
+                [slider.set_val(i) for i in range(1, max_slider_val + 1)]
+
+            _, seconds, peak = measure(sweep, repeat)
+            results.append(result('sweep', n_samples, seconds, peak, max_slider_val + 1))
+
+        if 'scale' in scenarios:
+            def scales():
+                [plot_object.radiobutton.set_active(i) for i in (1, 2, 3, 0)]
+                plot_object.fig.canvas.draw()
+
+            _, seconds, peak = measure(scales, repeat)
+            results.append(result('scale', n_samples, seconds, peak, 4))
+
+        plt.close('all')
+        print(['%s %d: %0.1f ms/event' % (i['scenario'], i['samples'], i['per_event_ms']) for i in results
+               if i['samples'] == n_samples])
+
+    if tmp is not None:
+        tmp.cleanup()
+
+    config = {'times': n_times, 'energies': n_energies, 'sample_counts': list(sample_counts), 'repeat': repeat,
+              'plotting_kwargs': plotting_kwargs, 'python': platform.python_version(), 'numpy': np.__version__,
+              'pandas': pd.__version__, 'matplotlib': matplotlib.__version__, 'platform': platform.platform()}
+
+    return {'config': config, 'results': results}
+
+
+if __name__=='__main__':
+
+    parser = argparse.ArgumentParser(description='Times loading and plotting of synthetic DART runs.')
+    parser.add_argument('--times', type=int, default=1000, help='no of time rows of each run')
+    parser.add_argument('--energies', type=int, default=300, help='no of energy points')
+    parser.add_argument('--samples', type=int, nargs='+', default=[1, 3], help='no of samples plotted together')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument('--workdir', default=None, help='keeps the synthetic runs there')
+    parser.add_argument('--blit', action='store_true')
+    parser.add_argument('--max-lines', type=int, default=None)
+    parser.add_argument('--out', default=None, help='JSON file of the results, printed otherwise')
+    args = parser.parse_args()
+
+    plotting_kwargs = {'blit': args.blit, 'max_lines': args.max_lines}
+    # the prints of the loader, Plotting and the summary go to stderr, stdout being only the JSON without --out
+    with contextlib.redirect_stdout(sys.stderr):
+        benchmarks = run_benchmarks(args.times, args.energies, args.samples, args.repeat, args.workdir,
+                                    args.scenarios, plotting_kwargs)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(benchmarks, f, indent=1)
+        print('Results written to', args.out)
+    else:
+        json.dump(benchmarks, sys.stdout, indent=1)
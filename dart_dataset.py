@@ -0,0 +1,86 @@
+from numpy import asarray
+
+"""
+Light container of a run, in place of the pandas DataFrame of load_data: numpy arrays only, so that loading
+and plotting a run need not import pandas.
+It has what Plotting and the loaders use of the DataFrame: values, index (times), columns (energies), attrs,
+len and iloc, and to_dataframe for anything else.
+
+    diffdata_list, sample_list, max_slider_val = load_data(directories=folders, container='dataset')
+"""
+
+
+class DartDataset:
+
+    """
+    Data matrix of a run with its times and energies.
+
+    """
+
+    __slots__ = ('values', 'index', 'columns', 'index_name', 'attrs')
+
+    def __init__(self, values, index, columns, index_name = None, attrs = None):
+        """
+
+        :param values: 2D array, one row per time
+        :param index: 1D array of the times
+        :param columns: 1D array of the energies
+        :param index_name: e.g. 'time (min)'
+        :param attrs: dict, as DataFrame.attrs
+        """
+        self.values = values
+        self.index = asarray(index)
+        self.columns = asarray(columns)
+        self.index_name = index_name
+        self.attrs = {} if attrs is None else attrs
+
+    def __len__(self):
+        return len(self.index)
+
+    def __repr__(self):
+        return 'DartDataset(%d times x %d energies, %s)' % (len(self.index), len(self.columns), self.values.dtype)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def iloc(self):
+        return PositionIndexer(self)
+
+    def to_numpy(self):
+        return self.values
+
+    def to_dataframe(self):
+        """
+
+        :return: pandas DataFrame of the same data, without copying it
+        """
+        import pandas as pd
+
+        diff_rpp_rss = pd.DataFrame(data=self.values, index=self.index, columns=self.columns, copy=False)
+        diff_rpp_rss.index.name = self.index_name
+        diff_rpp_rss.attrs.update(self.attrs)
+
+        return diff_rpp_rss
+
+
+class PositionIndexer:
+
+    """
+    Positional indexing, as DataFrame.iloc: a row gives a DartDataset with a 1D values, rows give a DartDataset
+    of those rows, and (rows, columns) selects the energies too.
+
+    """
+
+    __slots__ = ('dataset',)
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __getitem__(self, key):
+        rows, columns = key if isinstance(key, tuple) else (key, slice(None))
+        dataset = self.dataset
+
+        return DartDataset(dataset.values[rows, columns], dataset.index[rows], dataset.columns[columns],
+                           dataset.index_name, dataset.attrs)
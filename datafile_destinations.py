@@ -1,11 +1,17 @@
 import os
 
-def filepath(no = 1):
+def filepath(no = 1, root = None, **filters):
     """
     
     :param no: no of files to be loaded
+    :param root: directory of the runs, to choose them from the catalog of run_catalog instead of typing paths
+    :param filters: filters of run_catalog.filter_runs, with root
     :return: None
     """
+    if root is not None:
+        from run_catalog import choose_directories
+        return choose_directories(root, no, **filters)
+
     filepath_list = []
     count = 0
     while True:
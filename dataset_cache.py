@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+
+import mmap_data
+from datafile_destinations import filepath
+
+"""
+Persistent cache of loaded runs, so that opening the same run again is close to instant.
+Each entry is the run converted to the memory mapped format of mmap_data, which also stores the max of |delrho|,
+and is keyed on the path, size and mtime of the npz and on the loader options.
+Entries least recently used are removed once the cache exceeds its size limit.
+"""
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'dart_gui')
+
+# changing the layout of the entries invalidates them
+CACHE_VERSION = 1
+
+# entries are written in <key>.tmp<random> directories, see tmp_entry. Those left behind by a process which
+# died are removed by evict once they have not been written for this long.
+STALE_SECONDS = 24*3600
+
+
+def cache_key(npz_filename, choice, precision = 'complex128'):
+    """
+
+    :return: hex digest identifying the npz file as it is now and the loader options
+    """
+    stat = os.stat(npz_filename)
+    key = [os.path.abspath(npz_filename), stat.st_size, stat.st_mtime_ns, choice, 'mmap_data', CACHE_VERSION]
+    # the entries made before the precision option are complex128, and keep their keys
+    if precision != 'complex128':
+        key.append(precision)
+
+    return hashlib.sha1(json.dumps(key).encode()).hexdigest()
+
+
+def entry_size(entry):
+    return sum(os.path.getsize(os.path.join(entry, i)) for i in os.listdir(entry))
+
+
+def tmp_entry(entry):
+    """
+    Creates the directory an entry is written in before being renamed to entry, unique across processes and
+    threads.
+
+    :param entry: entry directory, without the final /
+    :return: the directory
+    """
+    return tempfile.mkdtemp(prefix=os.path.basename(entry) + '.tmp', dir=os.path.dirname(entry))
+
+
+def last_write(entry):
+    """
+
+    :return: latest mtime of the directory and of its files
+    """
+    return max([os.path.getmtime(entry)] + [os.path.getmtime(os.path.join(entry, i)) for i in os.listdir(entry)])
+
+
+def evict(cache_dir = CACHE_DIR, max_bytes = 4*2**30, keep = ()):
+    """
+    Removes the least recently used entries until the cache fits in max_bytes, and the entries being written
+    which were left behind (see STALE_SECONDS).
+
+    :param keep: entries not to remove, e.g. the ones just loaded
+    :return: None
+    """
+    entries = [os.path.join(cache_dir, i) for i in os.listdir(cache_dir)]
+    entries = [i for i in entries if os.path.isdir(i)]
+
+    for entry in [i for i in entries if '.tmp' in os.path.basename(i)]:
+        try:
+            stale = time.time() - last_write(entry) > STALE_SECONDS
+        except OSError:
+            # renamed or removed meanwhile
+            continue
+        if stale:
+            shutil.rmtree(entry, ignore_errors=True)
+            print('Removed from the cache, left unfinished:', entry)
+
+    # the entries being written are not counted
+    entries = [i for i in entries if '.tmp' not in os.path.basename(i)]
+    sizes = {i: entry_size(i) for i in entries}
+    total = sum(sizes.values())
+
+    # oldest access first
+    for entry in sorted(entries, key=os.path.getmtime):
+        if total <= max_bytes:
+            break
+        if entry in keep:
+            continue
+        shutil.rmtree(entry, ignore_errors=True)
+        total = total - sizes[entry]
+        print('Removed from the cache:', entry)
+
+
+def cached_folder(folder, choice = 'selected_', cache_dir = CACHE_DIR, precision = 'complex128'):
+    """
+    Cache entry of a folder, converting the npz if there is none yet.
+
+    :param precision: dtype of the entry, see loading_data_v2.PRECISIONS
+    :return: entry directory ending with /
+    """
+    key = cache_key(folder + choice + 'diff_rpp_rss.npz', choice, precision)
+    entry = os.path.join(cache_dir, key)
+
+    if os.path.isdir(entry):
+        # the mtime of the entry is its last access
+        os.utime(entry)
+    else:
+        print('Not in the cache:', folder)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = tmp_entry(entry)
+        try:
+            mmap_data.convert_npz(folder, choice, destination=tmp + os.sep, precision=precision)
+        except BaseException:
+            # no partial entry left behind
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        # another process may have written the entry meanwhile
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    return entry + os.sep
+
+
+def load_data(choice = 'selected_', directories = ['folder'], cache_dir = CACHE_DIR, max_bytes = 4*2**30,
+              precision = 'complex128'):
+    """
+    Same as loading_data_v2.load_data, through the cache.
+
+    :param cache_dir: directory of the cache
+    :param max_bytes: size limit of the cache
+    :param precision: as in loading_data_v2.load_data, each precision having its own entries
+    :return: diffdata_list, sample_name_list, max_slider_val
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    entries = [cached_folder(folder, choice, cache_dir, precision) for folder in directories]
+
+    evict(cache_dir, max_bytes, keep=[i.rstrip(os.sep) for i in entries])
+
+    return mmap_data.load_data(choice, entries)
+
+
+if __name__=='__main__':
+
+    num = int(input('Enter the number of directories: '))
+    data_for_plotting = load_data(directories=filepath(num))
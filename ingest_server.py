@@ -0,0 +1,260 @@
+import os
+import json
+import socket
+import struct
+import asyncio
+import threading
+from collections import deque
+
+import numpy as np
+
+"""
+Local push based ingestion: the DART processor sends its rows over a Unix domain socket (or localhost TCP)
+straight into the samples of a running Plotting, without going through files.
+
+Messages are framed as 1 byte type, 4 bytes little endian payload length, payload:
+    b'H' header, JSON: {"energies": [...], "meta_data": "...", "sample_index": 0}, sent first
+    b'R' rows, one or more records of float64 time followed by complex128 values at each energy
+
+The server runs its asyncio loop in a background thread and queues the rows; the GUI thread takes them with
+poll_into, from a canvas timer (attach). At most max_rows rows are queued: beyond that the server stops
+reading the socket, and the producer's sends block until the GUI catches up. A rows message may hold at most
+max_rows rows and a header at most MAX_HEADER_BYTES, larger frames close the connection.
+"""
+
+HEADER = b'H'
+ROWS = b'R'
+FRAME = struct.Struct('<cI')
+# e.g. about 500000 energies
+MAX_HEADER_BYTES = 16*2**20
+
+
+def row_dtype(n_energies):
+    return np.dtype([('time', '<f8'), ('values', '<c16', (n_energies,))])
+
+
+class IngestServer:
+
+    def __init__(self, path = None, host = '127.0.0.1', port = 0, max_rows = 10000):
+        """
+
+        :param path: Unix domain socket to listen on. None for TCP on host and port.
+        :param host: TCP host, localhost by default
+        :param port: TCP port, 0 for any free port (see address once started)
+        :param max_rows: no of rows queued before pushing back on the producers
+        """
+        self.path = path
+        self.host = host
+        self.port = port
+        self.max_rows = max_rows
+
+        # (sample_index, times, values) blocks, appended by the server thread and taken by the GUI thread
+        self.blocks = deque()
+        self.queued_rows = 0
+        self.lock = threading.Lock()
+
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.address = None
+        # exception of listen, raised by start
+        self.error = None
+
+    def start(self):
+        """
+        Starts listening in a background thread.
+
+        :return: address listened on, path or (host, port)
+        """
+        started = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(self.listen())
+            except Exception as error:
+                # e.g. the port in use, raised by start in the calling thread
+                self.error = error
+                loop.close()
+                return
+            finally:
+                started.set()
+            self.loop = loop
+            self.loop.run_forever()
+
+        self.error = None
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+        if self.error is not None:
+            self.thread.join()
+            raise self.error
+        print('Ingest server listening on', self.address)
+
+        return self.address
+
+    async def listen(self):
+        if self.path is not None:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.server = await asyncio.start_unix_server(self.handle, path=self.path)
+            self.address = self.path
+        else:
+            self.server = await asyncio.start_server(self.handle, host=self.host, port=self.port)
+            self.address = self.server.sockets[0].getsockname()[:2]
+
+    def stop(self):
+        if self.loop is None:
+            return
+
+        async def close():
+            self.server.close()
+            await self.server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def handle(self, reader, writer):
+        """
+        One producer connection: a header, then rows.
+        """
+        header = None
+        dtype = None
+
+        try:
+            while True:
+                kind, length = FRAME.unpack(await reader.readexactly(FRAME.size))
+
+                if kind == ROWS and header is None:
+                    print('Ingest: rows before the header, closing the connection')
+                    break
+                if kind not in (HEADER, ROWS):
+                    print('Ingest: unknown message type', kind)
+                    break
+
+                # the payload is read at once, its size is bounded before reading it
+                max_length = MAX_HEADER_BYTES if kind == HEADER else self.max_rows*dtype.itemsize
+                if length > max_length:
+                    print('Ingest: message of %d bytes, more than the %d allowed, closing the connection' %
+                          (length, max_length))
+                    break
+                payload = await reader.readexactly(length)
+
+                if kind == HEADER:
+                    header = json.loads(payload.decode())
+                    dtype = row_dtype(len(header['energies']))
+                    print('Ingest header:', header.get('meta_data'), 'sample', header.get('sample_index', 0))
+
+                else:
+                    if length % dtype.itemsize:
+                        print('Ingest: rows message not a whole no of rows, closing the connection')
+                        break
+                    records = np.frombuffer(payload, dtype=dtype)
+                    await self.put(header.get('sample_index', 0), records['time'].copy(), records['values'].copy())
+
+        except asyncio.IncompleteReadError:
+            # producer closed the connection
+            pass
+
+        finally:
+            writer.close()
+
+    async def put(self, sample_index, times, values):
+        # backpressure: not reading more from the socket while the queue is full
+        while self.queued_rows >= self.max_rows:
+            await asyncio.sleep(0.005)
+
+        with self.lock:
+            self.blocks.append((sample_index, times, values))
+            self.queued_rows = self.queued_rows + len(times)
+
+    def take(self):
+        """
+        Takes all the queued rows, joined per sample.
+
+        :return: dict of sample_index: (times, values)
+        """
+        with self.lock:
+            blocks = list(self.blocks)
+            self.blocks.clear()
+            self.queued_rows = 0
+
+        samples = {}
+        for sample_index, times, values in blocks:
+            samples.setdefault(sample_index, []).append((times, values))
+
+        return {i: (np.concatenate([j[0] for j in k]), np.concatenate([j[1] for j in k])) for i, k in samples.items()}
+
+    def poll_into(self, plot_object):
+        """
+        Adds the queued rows to plot_object, on the GUI thread.
+
+        :return: no of rows added
+        """
+        added = 0
+        for sample_index, (times, values) in self.take().items():
+            if sample_index >= plot_object.no_of_plots or values.shape[1] != len(plot_object.energy_ev):
+                print('Ingest: rows for sample %d do not match the plots, dropped' % sample_index)
+                continue
+            plot_object.append_rows(sample_index, times, values)
+            added = added + len(times)
+
+        return added
+
+    def attach(self, plot_object, interval_ms = 100):
+        """
+        Polls the queue from the GUI event loop. Keep the returned timer referenced.
+
+        :return: timer
+        """
+        timer = plot_object.fig.canvas.new_timer(interval=interval_ms)
+        timer.add_callback(self.poll_into, plot_object)
+        timer.start()
+
+        return timer
+
+
+class IngestClient:
+
+    """
+    Producer side, e.g. in the DART processing script. Sends block while the server pushes back.
+    """
+
+    def __init__(self, path = None, host = '127.0.0.1', port = None, max_rows = 10000):
+        """
+
+        :param max_rows: no of rows sent per message, at most the max_rows of the server
+        """
+        self.max_rows = max_rows
+        if path is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection((host, port))
+        self.dtype = None
+
+    def send(self, kind, payload):
+        self.sock.sendall(FRAME.pack(kind, len(payload)) + payload)
+
+    def send_header(self, energies, meta_data = '', sample_index = 0):
+        self.dtype = row_dtype(len(energies))
+        header = {'energies': [float(i) for i in energies], 'meta_data': str(meta_data), 'sample_index': sample_index}
+        self.send(HEADER, json.dumps(header).encode())
+
+    def send_rows(self, times, values):
+        """
+
+        :param times: 1D array of times
+        :param values: 2D (rows, energies) complex array, sent in messages of max_rows rows
+        """
+        for start in range(0, len(times), self.max_rows):
+            records = np.empty(len(times[start:start + self.max_rows]), dtype=self.dtype)
+            records['time'] = times[start:start + self.max_rows]
+            records['values'] = values[start:start + self.max_rows]
+            self.send(ROWS, records.tobytes())
+
+    def close(self):
+        self.sock.close()
@@ -0,0 +1,398 @@
+import os
+import json
+import zipfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import mmap_data
+from segment_cache import abs_max
+from loading_data_v2 import PRECISIONS, reduce_precision
+from run_catalog import npy_header, npy_array
+from dataset_cache import CACHE_DIR, cache_key, evict, tmp_entry
+from datafile_destinations import filepath
+
+"""
+Lazy datasets for Plotting: opening a run only reads its header (times, energies, meta_data), and the rows
+are read block by block when the slider reaches them.
+Blocks ahead of the slider, in the direction it moves, are read in a background thread, and the blocks
+used least recently are dropped once max_blocks are held.
+
+The rows come from the memory mapped copy of the run (see mmap_data), next to the npz or in the cache of
+dataset_cache. A run without a copy is opened from the headers of its npz, and its data is decompressed into
+the cache in a background thread, the rows becoming readable as it goes. The max of |delrho| for the y limits
+then starts from the first block and grows as the copy proceeds; watch_stats raises the y limits of the plots
+as it does. Once copied, the max is in the header of the cache entry.
+
+    diffdata_list, sample_list, max_slider_val = load_data(directories=folders)
+    plot_object = Plotting(diffdata_list, sample_list, 1, max_slider_val)
+    timer = watch_stats(plot_object, diffdata_list)
+"""
+
+
+class LazyRows:
+
+    """
+    Read only 2D array of the rows start to stop of a .npy file, read in blocks of block_rows rows.
+    Indexing with an int, a slice or an array of rows returns numpy arrays, like the memory map would.
+
+    """
+
+    def __init__(self, filename, start = 0, stop = None, block_rows = 256, max_blocks = 64, prefetch = 4,
+                 conversion = None):
+        """
+
+        :param filename: .npy file of the data, e.g. mmap_data.data_file, or the array being written by conversion
+        :param start: first row of the file used
+        :param stop: row after the last one used, the end of the file by default
+        :param block_rows: no of rows read at a time
+        :param max_blocks: no of blocks held in memory
+        :param prefetch: no of blocks read ahead of the last one used
+        :param conversion: BackgroundConversion writing the rows, waited for before reading them
+        """
+        self.data = np.load(filename, mmap_mode='r') if isinstance(filename, str) else filename
+        self.conversion = conversion
+        stop = len(self.data) if stop is None else stop
+        self.start = start
+        self.shape = (max(stop - start, 0),) + self.data.shape[1:]
+        self.dtype = self.data.dtype
+        self.ndim = self.data.ndim
+
+        self.block_rows = block_rows
+        self.max_blocks = max_blocks
+        self.prefetch = prefetch
+        self.n_blocks = -(-self.shape[0]//block_rows)
+
+        # block no: array, in order of use
+        self.blocks = OrderedDict()
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.last_block = 0
+        self.reader = ThreadPoolExecutor(max_workers=1)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype = None, copy = None):
+        # the whole data, e.g. when Plotting copies it to append rows
+        return np.asarray(self[:], dtype=dtype)
+
+    def read_block(self, block):
+        """
+
+        :return: array of the rows of block, read from the file
+        """
+        first = self.start + block*self.block_rows
+        stop = min(first + self.block_rows, self.start + len(self))
+        if self.conversion is not None:
+            self.conversion.wait(stop)
+        return np.array(self.data[first:stop])
+
+    def block(self, block):
+        """
+
+        :return: array of the rows of block, from memory or read now
+        """
+        with self.lock:
+            if block in self.blocks:
+                self.blocks.move_to_end(block)
+                return self.blocks[block]
+
+        return self.keep(block, self.read_block(block))
+
+    def keep(self, block, rows):
+        with self.lock:
+            self.blocks[block] = rows
+            self.blocks.move_to_end(block)
+            while len(self.blocks) > self.max_blocks:
+                self.blocks.popitem(last=False)
+            self.pending.discard(block)
+
+        return rows
+
+    def read_ahead(self, block):
+        """
+        Queues the reading of the blocks after block, in the direction of the previous access.
+        """
+        direction = -1 if block < self.last_block else 1
+        self.last_block = block
+
+        for ahead in range(block + direction, block + direction*(self.prefetch + 1), direction):
+            if not 0 <= ahead < self.n_blocks:
+                break
+            with self.lock:
+                if ahead in self.blocks or ahead in self.pending:
+                    continue
+                self.pending.add(ahead)
+            self.reader.submit(lambda ahead=ahead: self.keep(ahead, self.read_block(ahead)))
+
+    def __getitem__(self, key):
+        columns = slice(None)
+        if isinstance(key, tuple):
+            key, columns = key[0], key[1:]
+
+        if isinstance(key, (int, np.integer)):
+            row = key + len(self) if key < 0 else key
+            if not 0 <= row < len(self):
+                raise IndexError('row %d out of %d' % (key, len(self)))
+            block = row//self.block_rows
+            rows = self.block(block)[row - block*self.block_rows]
+            self.read_ahead(block)
+            return rows[columns]
+
+        rows = np.arange(len(self))[key] if isinstance(key, slice) else np.asarray(key)
+        rows = np.where(rows < 0, rows + len(self), rows)
+        out = np.empty((len(rows),) + self.shape[1:], dtype=self.dtype)
+        blocks = rows//self.block_rows
+
+        for block in np.unique(blocks):
+            in_block = blocks == block
+            out[in_block] = self.block(int(block))[rows[in_block] - block*self.block_rows]
+        if len(rows):
+            self.read_ahead(int(blocks[-1]))
+
+        return out[(slice(None),) + columns] if isinstance(columns, tuple) else out
+
+
+class LazyDataset:
+
+    """
+    What Plotting uses of the DataFrames of load_data: index (times), columns (energies), values and attrs.
+
+    """
+
+    def __init__(self, index, columns, values, attrs = None):
+        self.index = index
+        self.columns = columns
+        self.values = values
+        self.attrs = attrs or {}
+
+    def __len__(self):
+        return len(self.index)
+
+
+class BackgroundConversion:
+
+    """
+    Copy of the data of an npz into a cache entry in the format of mmap_data, decompressed block by block in a
+    background thread. data is the memory map being written, rows_done the no of its rows written, and abs_max
+    the max of |values| of the rows written so far, of the rows kept by load_data.
+
+    """
+
+    def __init__(self, npz_filename, entry, header, choice = 'selected_', block_rows = 256, max_bytes = 4*2**30,
+                 precision = 'complex128'):
+        """
+
+        :param npz_filename: npz of the run
+        :param entry: cache entry ending with /, written in a directory of dataset_cache.tmp_entry and renamed
+                      once complete
+        :param header: header of the entry without abs_max, see mmap_data.convert_npz
+        :param choice: prefix of the files
+        :param block_rows: no of rows decompressed at a time
+        :param max_bytes: size limit of the cache, applied once the copy is complete
+        :param precision: dtype of the copy, see loading_data_v2.PRECISIONS, each block being converted as it
+                          is decompressed
+        """
+        self.npz_filename = npz_filename
+        self.entry = entry.rstrip(os.sep)
+        self.header = header
+        self.choice = choice
+        self.block_rows = block_rows
+        self.max_bytes = max_bytes
+        self.precision = precision
+        self.header['precision'] = precision
+
+        self.zip_file = zipfile.ZipFile(npz_filename)
+        self.member = self.zip_file.open('values.npy')
+        npy = npy_header(self.member)
+        if npy is None:
+            raise ValueError('%s: unsupported version of the .npy format' % npz_filename)
+        self.shape, self.fortran_order, self.dtype = npy
+        if self.dtype.hasobject:
+            raise ValueError('%s: the rows of an object array cannot be copied block by block' % npz_filename)
+        # complex128 keeps the data as saved, as in loading_data_v2
+        dtype = self.dtype if precision == 'complex128' else PRECISIONS[precision]
+
+        self.tmp_entry = tmp_entry(self.entry)
+        self.data = np.lib.format.open_memmap(mmap_data.data_file(self.tmp_entry + os.sep, choice), mode='w+',
+                                              dtype=dtype, shape=self.shape)
+
+        self.rows_done = 0
+        self.abs_max = 0.0
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+        # zlib releases the GIL while decompressing, the GUI keeps running meanwhile
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        n_rows = self.shape[0]
+        # rows of a Fortran ordered array are not contiguous, it is read at once
+        block_rows = max(n_rows, 1) if self.fortran_order else self.block_rows
+        row_bytes = self.dtype.itemsize*int(np.prod(self.shape[1:]))
+
+        try:
+            for start in range(0, n_rows, block_rows):
+                stop = min(start + block_rows, n_rows)
+                block = np.frombuffer(self.member.read((stop - start)*row_bytes), dtype=self.dtype)
+                block = block.reshape((stop - start,) + self.shape[1:], order='F' if self.fortran_order else 'C')
+                if self.precision != 'complex128':
+                    block = reduce_precision(block, self.precision)[0]
+                self.data[start:stop] = block
+
+                # the 1st and last rows are dropped by load_data
+                kept = self.data[max(start, 1):min(stop, n_rows - 1)]
+                if len(kept):
+                    self.abs_max = max(self.abs_max, abs_max(kept))
+                with self.condition:
+                    self.rows_done = stop
+                    self.condition.notify_all()
+
+            self.data.flush()
+            self.header['abs_max'] = self.abs_max
+            with open(mmap_data.header_file(self.tmp_entry + os.sep, self.choice), 'w') as f:
+                json.dump(self.header, f)
+            # another process may have written the entry meanwhile, which is then used next time
+            try:
+                os.rename(self.tmp_entry, self.entry)
+            except OSError:
+                pass
+            evict(os.path.dirname(self.entry), self.max_bytes, keep=[self.entry])
+        except Exception as error:
+            self.error = error
+            print('Copy of %s to the cache failed:' % self.npz_filename, error)
+        finally:
+            self.zip_file.close()
+            with self.condition:
+                self.done = True
+                self.condition.notify_all()
+
+    def wait(self, rows):
+        """
+        Waits until the first rows are written.
+        """
+        with self.condition:
+            while self.rows_done < rows and not self.done:
+                self.condition.wait()
+        if self.rows_done < rows:
+            raise RuntimeError('rows %d to %d of %s were not copied: %s' % (self.rows_done, rows,
+                                                                            self.npz_filename, self.error))
+
+
+def open_run(folder, choice = 'selected_', block_rows = 256, max_blocks = 64, prefetch = 4, cache_dir = CACHE_DIR,
+             max_bytes = 4*2**30, precision = 'complex128'):
+    """
+    Opens a run, reading only its header: from its memory mapped copy next to the npz or in the cache, else
+    from the npz, copied to the cache in the background (see BackgroundConversion).
+
+    :param precision: as in loading_data_v2.load_data. The copy next to the npz is used if it has this
+                      precision, each precision having its own cache entries.
+    :return: LazyDataset of the rows kept by load_data, sample name
+    """
+    npz_filename = folder + choice + 'diff_rpp_rss.npz'
+    entry = None
+    converted = None
+
+    # copy next to the npz, made by mmap_data.convert_npz, else in the cache
+    if os.path.exists(mmap_data.header_file(folder, choice)):
+        with open(mmap_data.header_file(folder, choice)) as f:
+            header = json.load(f)
+        # headers written before the precision option are complex128
+        if header.get('precision', 'complex128') == precision:
+            converted = folder
+    if converted is None:
+        entry = os.path.join(cache_dir, cache_key(npz_filename, choice, precision)) + os.sep
+        if os.path.exists(mmap_data.header_file(entry, choice)):
+            # the mtime of the entry is its last access
+            os.utime(entry)
+            with open(mmap_data.header_file(entry, choice)) as f:
+                header = json.load(f)
+            converted = entry
+
+    if converted is not None:
+        # dropping the 1st and last, as load_data
+        values = LazyRows(mmap_data.data_file(converted, choice), 1, len(header['index']) - 1, block_rows, max_blocks,
+                          prefetch)
+        dataset = LazyDataset(np.asarray(header['index'][1:-1], dtype=np.float64), np.asarray(header['col_names']),
+                              values, {'abs_max': header.get('abs_max')})
+        return dataset, header['meta_data']
+
+    with zipfile.ZipFile(npz_filename) as zip_file:
+        header = {'index': npy_array(zip_file, 'index.npy').tolist(),
+                  'index_name': str(npy_array(zip_file, 'index_name.npy')),
+                  'col_names': npy_array(zip_file, 'col_names.npy').tolist(),
+                  'meta_data': str(npy_array(zip_file, 'meta_data.npy'))}
+
+    os.makedirs(cache_dir, exist_ok=True)
+    conversion = BackgroundConversion(npz_filename, entry, dict(header), choice, block_rows, max_bytes, precision)
+    values = LazyRows(conversion.data, 1, len(header['index']) - 1, block_rows, max_blocks, prefetch, conversion)
+    dataset = LazyDataset(np.asarray(header['index'][1:-1], dtype=np.float64), np.asarray(header['col_names']),
+                          values, {'stats': conversion})
+
+    # estimate from the first block, refined as the copy proceeds
+    if len(values):
+        values.block(0)
+    dataset.attrs['abs_max'] = conversion.abs_max
+
+    return dataset, header['meta_data']
+
+
+def load_data(choice = 'selected_', directories = ['folder'], block_rows = 256, max_blocks = 64, prefetch = 4,
+              cache_dir = CACHE_DIR, max_bytes = 4*2**30, precision = 'complex128'):
+    """
+    Same as loading_data_v2.load_data, with LazyDatasets instead of DataFrames.
+
+    :param block_rows: no of rows read at a time
+    :param max_blocks: no of blocks of each run held in memory
+    :param prefetch: no of blocks read ahead of the slider
+    :param cache_dir: directory of the cache the runs without a memory mapped copy are copied to
+    :param max_bytes: size limit of the cache
+    :param precision: as in loading_data_v2.load_data
+    :return: diffdata_list, sample_name_list, max_slider_val
+    """
+    diffdata_list = []
+    sample_name_list = []
+    max_slider_val = 0
+
+    for folder in directories:
+        dataset, sample_name = open_run(folder, choice, block_rows, max_blocks, prefetch, cache_dir, max_bytes,
+                                        precision)
+        print('Sample: ', sample_name)
+        sample_name_list.append(sample_name)
+        max_slider_val = len(dataset)
+        diffdata_list.append(dataset)
+
+    return diffdata_list, sample_name_list, max_slider_val
+
+
+def watch_stats(plot_object, diffdata_list, interval_ms = 250):
+    """
+    Raises the y limits of plot_object as the max of the runs being copied grows, from the GUI event loop.
+    Keep the returned timer referenced.
+
+    :return: timer, stopped once all the stats are done
+    """
+    timer = plot_object.fig.canvas.new_timer(interval=interval_ms)
+
+    def poll():
+        stats = [(i, j.attrs.get('stats')) for i, j in enumerate(diffdata_list)]
+        stats = [(i, j) for i, j in stats if j is not None]
+        if any([plot_object.grow_y_lim(i, j.abs_max) for i, j in stats]):
+            plot_object.fig.canvas.draw_idle()
+        if all(j.done for _, j in stats):
+            timer.stop()
+
+    timer.add_callback(poll)
+    timer.start()
+
+    return timer
+
+
+if __name__=='__main__':
+
+    num = int(input('Enter the number of directories: '))
+    data_for_plotting = load_data(directories=filepath(num))
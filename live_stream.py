@@ -0,0 +1,114 @@
+import os
+import numpy as np
+from zipfile import BadZipFile
+
+"""
+Live mode: watching the DART output directories of a running deposition and adding the new rows to Plotting.
+"""
+
+
+class DirectoryWatcher:
+
+    """
+    Polls the diff_rpp_rss.npz of a folder and returns the rows added since the last poll.
+    Like load_data, the first and the last row of the file are left out, the last one being
+    the boundary of the derivative until the next row is written.
+
+    """
+
+    def __init__(self, folder, choice = 'selected_', next_row = None):
+        """
+
+        :param folder: directory ending with /
+        :param choice: prefix of the file, as in load_data
+        :param next_row: first row of the file not yet read. None for the rows load_data read already.
+        """
+        self.filename = folder + choice + 'diff_rpp_rss.npz'
+        self.last_stat = None
+
+        if next_row is None:
+            self.last_stat = self.stat()
+            with np.load(self.filename, allow_pickle=True) as npz_file:
+                next_row = len(npz_file['index']) - 1
+        self.next_row = next_row
+
+    def stat(self):
+        stat = os.stat(self.filename)
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self):
+        """
+
+        :return: (times, values) of the new rows, None if the file has not changed
+        """
+        try:
+            stat = self.stat()
+        except FileNotFoundError:
+            return None
+
+        if stat == self.last_stat:
+            return None
+
+        try:
+            with np.load(self.filename, allow_pickle=True) as npz_file:
+                # index is small, reading it first to skip decompressing unchanged files
+                times = npz_file['index']
+                if len(times) - 1 <= self.next_row:
+                    self.last_stat = stat
+                    return None
+                values = npz_file['values']
+        except (BadZipFile, EOFError, ValueError, OSError):
+            # the file is being written, trying again at the next poll
+            return None
+
+        self.last_stat = stat
+        new_rows = slice(self.next_row, len(times) - 1)
+        self.next_row = len(times) - 1
+
+        return times[new_rows], values[new_rows]
+
+
+def poll_once(plot_object, watchers):
+    """
+    Adds the new rows of each watcher to the corresponding sample of plot_object.
+
+    :param plot_object: Plotting
+    :param watchers: list of objects with a poll() method, one per sample, in the order of the samples
+    :return: no of rows added
+    """
+    added = 0
+    for i, watcher in enumerate(watchers):
+        new_rows = watcher.poll()
+        if new_rows is not None:
+            plot_object.append_rows(i, *new_rows)
+            added = added + len(new_rows[0])
+
+    return added
+
+
+def start_polling(plot_object, watchers, interval_ms = 1000):
+    """
+    Polls the watchers from the GUI event loop. Keep the returned timer referenced.
+    Timers do not run on non-interactive backends, call poll_once there.
+
+    :param plot_object: Plotting
+    :param watchers: list of objects with a poll() method, one per sample
+    :param interval_ms: polling interval
+    :return: timer
+    """
+    timer = plot_object.fig.canvas.new_timer(interval=interval_ms)
+    timer.add_callback(poll_once, plot_object, watchers)
+    timer.start()
+
+    return timer
+
+
+def watch_directories(plot_object, directories, choice = 'selected_', interval_ms = 1000):
+    """
+    Live mode for the directories given to load_data.
+
+    :return: timer
+    """
+    watchers = [DirectoryWatcher(folder, choice) for folder in directories]
+
+    return start_polling(plot_object, watchers, interval_ms)
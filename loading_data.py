@@ -3,6 +3,37 @@ import pandas as pd
 from datafile_destinations import filepath
 
 
+def read_folder(folder, choice = 'selected_'):
+    """
+    Reads the arrays of the npz and the times_thickness.csv of a folder: the I/O and decompression part of load_data.
+
+    :return: dict of the arrays in the npz, DataFrame of times and thicknesses
+    """
+    npz_file = np.load(folder + choice + 'diff_rpp_rss.npz', allow_pickle=True)
+    print('Files in npz:', npz_file.files)
+
+    times_thicknesses = pd.read_csv(folder + choice + 'times_thickness.csv')
+    # dropping the 1st and the last to keep the derivative calc consistent,
+    # i.e. removing the calculations at the boundaries: 1st and the last point.
+    # times_thicknesses = times_thicknesses.iloc[1:-1]
+    # times_thicknesses.reset_index(inplace=True, drop=True)
+
+    return {key: npz_file[key] for key in npz_file.files}, times_thicknesses
+
+
+def to_dataframe(arrays):
+    """
+    Converts the arrays of read_folder into the DataFrame used for plotting.
+    """
+    diff_rpp_rss = pd.DataFrame(data=arrays['values'], index=arrays['index'], columns=arrays['col_names'])
+    # saved as a 0-d array, which cannot be an index name
+    diff_rpp_rss.index.name = arrays['index_name'].item()
+
+    # diff_rpp_rss = diff_rpp_rss.iloc[1:-1]  # dropping the 1st and last
+
+    return diff_rpp_rss
+
+
 def load_data(choice = 'selected_', directories = ['folder']):
     
     # list containing the data as pandas DataFrame
@@ -18,27 +49,19 @@ def load_data(choice = 'selected_', directories = ['folder']):
     max_slider_val = 0
     
     for folder in directories:
-        npz_file = np.load(folder + choice + 'diff_rpp_rss.npz', allow_pickle=True)
-        print('Files in npz:', npz_file.files)
+        arrays, times_thicknesses = read_folder(folder, choice)
 
-        diff_rpp_rss = pd.DataFrame(data=npz_file['values'], index=npz_file['index'], columns=npz_file['col_names'])
-        diff_rpp_rss.index.name = npz_file['index_name']
+        diff_rpp_rss = to_dataframe(arrays)
         
-        print('Sample: ', npz_file['meta_data'])
-        sample_name_list.append(npz_file['meta_data'])
-
-        times_thicknesses = pd.read_csv(folder + choice + 'times_thickness.csv')
-        # dropping the 1st and the last to keep the derivative calc consistent,
-        # i.e. removing the calculations at the boundaries: 1st and the last point.
-        # times_thicknesses = times_thicknesses.iloc[1:-1]
-        # times_thicknesses.reset_index(inplace=True, drop=True)
+        print('Sample: ', arrays['meta_data'])
+        sample_name_list.append(arrays['meta_data'])
+
         thickness_list.append(times_thicknesses)
         
         # Setting the maximum value of the slider
         max_slider_val = times_thicknesses.iloc[:,1].values[-1] if times_thicknesses.iloc[:,1].values[-1] > \
                                                                    max_slider_val else max_slider_val
 
-        # diff_rpp_rss = diff_rpp_rss.iloc[1:-1]  # dropping the 1st and last
         diffdata_list.append(diff_rpp_rss)
         
     return diffdata_list, thickness_list, sample_name_list, max_slider_val
@@ -1,15 +1,122 @@
 import numpy as np
-import pandas as pd
 from datafile_destinations import filepath
+from dart_dataset import DartDataset
 
+# pandas is imported by to_dataframe only, so that loading into DartDatasets does not pay for its import
 
-def load_data(choice = 'selected_', directories = ['folder']):
+# dtype of the data matrix for each precision of load_data. magnitude32 keeps |delrho| only, which is all the
+# plots use, as float32.
+PRECISIONS = {'complex128': np.complex128, 'complex64': np.complex64, 'magnitude32': np.float32}
+
+
+def read_folder(folder, choice = 'selected_'):
+    """
+    Reads the arrays of the npz of a folder: the I/O and decompression part of load_data.
+
+    :return: dict of the arrays in the npz
+    """
+    npz_file = np.load(folder + choice + 'diff_rpp_rss.npz', allow_pickle=True)
+    print('Files in npz:', npz_file.files)
+
+    return {key: npz_file[key] for key in npz_file.files}
+
+
+def reduce_precision(values, precision = 'complex128', block_rows = 1024):
+    """
+    Converts the data matrix to a smaller dtype, block by block so that no full size temporary is made.
+
+    :param values: 2D complex array
+    :param precision: one of PRECISIONS
+    :return: converted array, maximum absolute error of |values| introduced
+    """
+    dtype = PRECISIONS[precision]
+    if values.dtype == dtype:
+        return values, 0.0
+
+    reduced = np.empty(values.shape, dtype=dtype)
+    max_error = 0.0
+    for start in range(0, len(values), block_rows):
+        block = values[start:start + block_rows]
+        if precision == 'magnitude32':
+            reduced[start:start + block_rows] = np.absolute(block)
+        else:
+            reduced[start:start + block_rows] = block
+        error = np.absolute(np.absolute(reduced[start:start + block_rows]) - np.absolute(block))
+        max_error = max(max_error, float(error.max()) if error.size else 0.0)
+
+    return reduced, max_error
+
+
+def convert_values(arrays, precision = 'complex128'):
+    """
+    Data matrix of the arrays of read_folder at the given precision, the part of the conversion common to
+    to_dataframe and to_dataset.
+
+    :return: values, dict of attrs
+    """
+    values = arrays['values']
+    if precision == 'complex128':
+        return values, {}
+
+    reduced, max_error = reduce_precision(values, precision)
+    print('Precision %s: %0.1f MB instead of %0.1f MB, max error of |delrho| %0.3g' %
+          (precision, reduced.nbytes/2**20, values.nbytes/2**20, max_error))
+
+    return reduced, {'precision': {'precision': precision, 'bytes_saved': values.nbytes - reduced.nbytes,
+                                   'max_error': max_error}}
+
+
+def to_dataframe(arrays, precision = 'complex128'):
+    """
+    Converts the arrays of read_folder into the DataFrame used for plotting.
+
+    :param precision: dtype of the data, see PRECISIONS. The memory saved and the maximum error of |delrho| are
+                      printed and kept in attrs['precision'].
+    """
+    import pandas as pd
+
+    values, attrs = convert_values(arrays, precision)
+
+    diff_rpp_rss = pd.DataFrame(data=values, index=arrays['index'], columns=arrays['col_names'])
+    # saved as a 0-d array, which cannot be an index name
+    diff_rpp_rss.index.name = arrays['index_name'].item()
+
+    diff_rpp_rss = diff_rpp_rss.iloc[1:-1]  # dropping the 1st and last 
+    # does not work properly unless the deposition starts at t = 0 and ends at t = last time point in the measured data.
     
-    # list containing the data as pandas DataFrame
-    diffdata_list = []
+    diff_rpp_rss.attrs.update(attrs)
+
+    return diff_rpp_rss
+
+
+def to_dataset(arrays, precision = 'complex128'):
+    """
+    Same as to_dataframe, into a DartDataset. The rows are views of the arrays, not copies.
+    """
+    values, attrs = convert_values(arrays, precision)
+
+    # dropping the 1st and last, as to_dataframe
+    return DartDataset(values[1:-1], arrays['index'][1:-1], arrays['col_names'], arrays['index_name'].item(), attrs)
+
+
+# converters of load_data
+CONTAINERS = {'dataframe': to_dataframe, 'dataset': to_dataset}
+
+
+def load_data(choice = 'selected_', directories = ['folder'], precision = 'complex128', profiler = None,
+              container = 'dataframe'):
+    """
+    
+    :param precision: 'complex128' to keep the data as saved, 'complex64' or 'magnitude32' to keep about
+                      twice or four times as many runs in memory (see reduce_precision)
+    :param profiler: profiling.StageProfiler timing the reading and the conversion of each folder
+    :param container: 'dataframe' for pandas DataFrames, 'dataset' for DartDatasets, which Plotting uses the same
+                      way without importing pandas
+    :return: diffdata_list, sample_name_list, max_slider_val
+    """
     
-    # list containing the corresponding thickness list
-    thickness_list = []
+    # list containing the data as pandas DataFrame or DartDataset
+    diffdata_list = []
     
     # list containing the corresponding sample details
     sample_name_list = []
@@ -17,19 +124,17 @@ def load_data(choice = 'selected_', directories = ['folder']):
     # object for holder the maximum slider value
     max_slider_val = 0
     
+    read, convert = read_folder, CONTAINERS[container]
+    if profiler:
+        read, convert = profiler.wrap('read_folder', read), profiler.wrap('to_' + container, convert)
+    
     for folder in directories:
-        npz_file = np.load(folder + choice + 'diff_rpp_rss.npz', allow_pickle=True)
-        print('Files in npz:', npz_file.files)
-
-        diff_rpp_rss = pd.DataFrame(data=npz_file['values'], index=npz_file['index'], columns=npz_file['col_names'])
-        diff_rpp_rss.index.name = npz_file['index_name']
+        arrays = read(folder, choice)
         
-        print('Sample: ', npz_file['meta_data'])
-        sample_name_list.append(npz_file['meta_data'])
-
-        diff_rpp_rss = diff_rpp_rss.iloc[1:-1]  # dropping the 1st and last 
-        # does not work properly unless the deposition starts at t = 0 and ends at t = last time point in the measured data.
+        print('Sample: ', arrays['meta_data'])
+        sample_name_list.append(arrays['meta_data'])
 
+        diff_rpp_rss = convert(arrays, precision)
         
         # Setting the maximum value of the slider
         max_slider_val =  len(diff_rpp_rss)
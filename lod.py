@@ -0,0 +1,88 @@
+from numpy import (absolute, arange, argmax, argmin, concatenate, cumsum, diff, empty, float64, linspace, maximum,
+                   minimum, pad, searchsorted, stack, take_along_axis, unique, zeros)
+
+"""
+Level of detail for the cumulative plots: which past lines to draw and how many points per line.
+"""
+
+
+def select_lines(n_lines, max_lines, weights = None):
+    """
+    Picks at most max_lines of range(n_lines), always keeping the first and the last one.
+
+    :param n_lines: no of lines available
+    :param max_lines: line budget
+    :param weights: None for evenly spaced lines. Otherwise an array of n_lines non-negative weights,
+                    e.g. the change from the previous line, and the lines are spaced evenly in cumulative weight
+                    so that the parts of the run that change the most get the most lines. All zero weights,
+                    e.g. a flat run, give evenly spaced lines.
+    :return: sorted array of line indices
+    """
+    if n_lines <= max_lines:
+        return arange(n_lines)
+
+    # nothing to space the lines by when no line changes
+    if weights is None or not weights.sum() > 0:
+        lines = linspace(0, n_lines - 1, max_lines).round().astype(int)
+    else:
+        # adding the mean so that parts where nothing changes still get some lines
+        cumulative = cumsum(weights + weights.mean())
+        lines = searchsorted(cumulative, linspace(cumulative[0], cumulative[-1], max_lines))
+        lines = concatenate([[0], lines, [n_lines - 1]])
+
+    return unique(minimum(lines, n_lines - 1))
+
+
+def minmax_downsample(x, y, max_points):
+    """
+    Reduces each line of y to at most max_points points by keeping the minimum and the maximum of
+    each bucket of consecutive points, in their original order, so peaks are never lost.
+
+    :param x: (points, ) array, e.g. the energy axis
+    :param y: (lines, points) array
+    :param max_points: no of points per line to keep
+    :return: (lines, points kept, 2) array of segments
+    """
+    n_lines, n_points = y.shape
+
+    if n_points <= max_points:
+        segments = empty((n_lines, n_points, 2), dtype=float64)
+        segments[:, :, 0] = x
+        segments[:, :, 1] = y
+        return segments
+
+    n_buckets = max(max_points//2, 1)
+    width = -(-n_points//n_buckets)
+    # padding with the last point so that all the buckets have the same width
+    padded = pad(y, ((0, 0), (0, n_buckets*width - n_points)), mode='edge').reshape(n_lines, n_buckets, width)
+
+    start = arange(n_buckets)*width
+    lowest = minimum(argmin(padded, axis=2) + start, n_points - 1)
+    highest = minimum(argmax(padded, axis=2) + start, n_points - 1)
+
+    index = stack([minimum(lowest, highest), maximum(lowest, highest)], axis=2).reshape(n_lines, 2*n_buckets)
+
+    segments = empty((n_lines, 2*n_buckets, 2), dtype=float64)
+    segments[:, :, 0] = x[index]
+    segments[:, :, 1] = take_along_axis(y, index, axis=1)
+
+    return segments
+
+
+def line_changes(values, block_rows = 1024):
+    """
+    Change of each row from the previous one, sum(||row| - |previous row||), computed block by block.
+
+    :param values: 2D array of the data
+    :param block_rows: no of rows to take at a time
+    :return: array of len(values), 0 for the first row
+    """
+    changes = zeros(len(values), dtype=float64)
+
+    for start in range(0, len(values), block_rows):
+        # one row of overlap with the previous block
+        first = max(start - 1, 0)
+        magnitudes = absolute(values[first:start + block_rows])
+        changes[first + 1:start + block_rows] = absolute(diff(magnitudes, axis=0)).sum(axis=1)
+
+    return changes
@@ -0,0 +1,106 @@
+import json
+import numpy as np
+from datafile_destinations import filepath
+from segment_cache import abs_max
+from loading_data_v2 import reduce_precision
+
+"""
+Uncompressed, memory mapped alternative to the pickled diff_rpp_rss.npz:
+    <choice>diff_rpp_rss.npy          raw data array, opened with mmap_mode='r'
+    <choice>diff_rpp_rss_header.json  index, index_name, col_names, meta_data, abs_max and precision
+Opening a run only reads the header; rows are paged in by the OS when the plots reach them.
+"""
+
+
+def header_file(folder, choice = 'selected_'):
+    return folder + choice + 'diff_rpp_rss_header.json'
+
+
+def data_file(folder, choice = 'selected_'):
+    return folder + choice + 'diff_rpp_rss.npy'
+
+
+def convert_npz(folder, choice = 'selected_', destination = None, precision = 'complex128'):
+    """
+    Writes the .npy and the header next to the npz of the folder.
+
+    :param folder: directory ending with /
+    :param choice: prefix of the files, as in load_data
+    :param destination: directory ending with / to write to instead of folder
+    :param precision: dtype of the .npy, see loading_data_v2.PRECISIONS
+    :return: None
+    """
+    destination = destination or folder
+    npz_file = np.load(folder + choice + 'diff_rpp_rss.npz', allow_pickle=True)
+    values, max_error = reduce_precision(npz_file['values'], precision)
+    np.save(data_file(destination, choice), values)
+
+    header = {'index': npz_file['index'].tolist(),
+              'index_name': str(npz_file['index_name']),
+              'col_names': npz_file['col_names'].tolist(),
+              'meta_data': str(npz_file['meta_data']),
+              # of the rows kept by load_data, used for the y limits without reading the data
+              'abs_max': abs_max(values[1:-1]),
+              'precision': precision}
+
+    with open(header_file(destination, choice), 'w') as f:
+        json.dump(header, f)
+
+    print('Converted', folder + choice + 'diff_rpp_rss.npz', values.shape, precision,
+          'max error of |delrho| %0.3g' % max_error if max_error else '')
+
+
+def load_data(choice = 'selected_', directories = ['folder'], precision = None):
+    """
+    Same as loading_data_v2.load_data for converted folders. The DataFrames wrap the memory map
+    without copying it and carry abs_max in their attrs.
+
+    :param precision: precision of the data, None for the one it was converted at. A folder converted at
+                      another precision is converted in memory, no longer memory mapped.
+
+    :return: diffdata_list, sample_name_list, max_slider_val
+    """
+    # only here, so that converting and lazy_dataset do not import pandas
+    import pandas as pd
+
+    # list containing the data as pandas DataFrame
+    diffdata_list = []
+
+    # list containing the corresponding sample details
+    sample_name_list = []
+
+    # object for holder the maximum slider value
+    max_slider_val = 0
+
+    for folder in directories:
+        with open(header_file(folder, choice)) as f:
+            header = json.load(f)
+
+        values = np.load(data_file(folder, choice), mmap_mode='r')
+        # headers written before the precision option are complex128
+        if precision is not None and precision != header.get('precision', 'complex128'):
+            print('%s was converted at %s, converting to %s in memory' % (folder, header.get('precision', 'complex128'),
+                                                                         precision))
+            values = reduce_precision(values, precision)[0]
+
+        diff_rpp_rss = pd.DataFrame(data=values, index=header['index'], columns=header['col_names'], copy=False)
+        diff_rpp_rss.index.name = header['index_name']
+
+        print('Sample: ', header['meta_data'])
+        sample_name_list.append(header['meta_data'])
+
+        diff_rpp_rss = diff_rpp_rss.iloc[1:-1]  # dropping the 1st and last
+        diff_rpp_rss.attrs['abs_max'] = header['abs_max']
+
+        # Setting the maximum value of the slider
+        max_slider_val = len(diff_rpp_rss)
+
+        diffdata_list.append(diff_rpp_rss)
+
+    return diffdata_list, sample_name_list, max_slider_val
+
+
+if __name__=='__main__':
+
+    num = int(input('Enter the number of directories to convert: '))
+    [convert_npz(folder) for folder in filepath(num)]
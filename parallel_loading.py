@@ -0,0 +1,110 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from time import perf_counter
+
+import loading_data
+import loading_data_v2
+from datafile_destinations import filepath
+
+"""
+Concurrent version of load_data for several directories, e.g. on network mounted storage.
+Reading and decompressing the npz (and the csv for v1) runs in a thread pool, numpy and zlib releasing the GIL,
+and the conversion into DataFrames runs in the same threads or, optionally, in a process pool.
+The results are in the order of the directories and have the shape of the sequential load_data.
+"""
+
+
+def timed(function, *args):
+    """
+
+    :return: result of function(*args), seconds taken
+    """
+    start = perf_counter()
+    result = function(*args)
+
+    return result, perf_counter() - start
+
+
+def read_and_convert(module, folder, choice, precision = 'complex128'):
+    """
+    Whole load of a folder, in one thread.
+    """
+    read, read_time = timed(module.read_folder, folder, choice)
+    if module is loading_data:
+        diff_rpp_rss, convert_time = timed(module.to_dataframe, read[0])
+    else:
+        diff_rpp_rss, convert_time = timed(module.to_dataframe, read, precision)
+
+    return read, diff_rpp_rss, read_time, convert_time
+
+
+def load_data(choice = 'selected_', directories = ['folder'], version = 2, max_workers = None, processes = False,
+              precision = 'complex128'):
+    """
+
+    :param choice: prefix of the files, as in load_data
+    :param directories: list of directories ending with /
+    :param version: 1 for loading_data (with thicknesses), 2 for loading_data_v2
+    :param max_workers: size of the pools, one worker per directory by default
+    :param processes: converting into DataFrames in a process pool instead of the reading threads
+    :param precision: as in loading_data_v2.load_data, version 2 only
+    :return: same tuple as the load_data of the version. The per folder timings are printed and kept in
+             attrs['load_times'] of each DataFrame.
+    """
+    module = loading_data if version == 1 else loading_data_v2
+    if module is loading_data and precision != 'complex128':
+        raise ValueError('precision is only available with version 2')
+    n_workers = max_workers or max(len(directories), 1)
+    start = perf_counter()
+
+    with ThreadPoolExecutor(max_workers=n_workers) as threads:
+        if not processes:
+            results = list(threads.map(read_and_convert, [module]*len(directories), directories,
+                                       [choice]*len(directories), [precision]*len(directories)))
+        else:
+            reads = list(threads.map(timed, [module.read_folder]*len(directories), directories,
+                                     [choice]*len(directories)))
+            arrays_list = [read[0] if module is loading_data else read for read, _ in reads]
+
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                if module is loading_data:
+                    converted = list(pool.map(timed, [module.to_dataframe]*len(directories), arrays_list))
+                else:
+                    converted = list(pool.map(timed, [module.to_dataframe]*len(directories), arrays_list,
+                                              [precision]*len(directories)))
+
+            results = [(read, diff_rpp_rss, read_time, convert_time) for (read, read_time), (diff_rpp_rss, convert_time)
+                       in zip(reads, converted)]
+
+    print('Loaded %d directories in %0.2f s' % (len(directories), perf_counter() - start))
+
+    diffdata_list = []
+    thickness_list = []
+    sample_name_list = []
+    max_slider_val = 0
+
+    for folder, (read, diff_rpp_rss, read_time, convert_time) in zip(directories, results):
+        print('%s: read %0.2f s, convert %0.2f s' % (folder, read_time, convert_time))
+        diff_rpp_rss.attrs['load_times'] = {'read': read_time, 'convert': convert_time}
+
+        if module is loading_data:
+            arrays, times_thicknesses = read
+            thickness_list.append(times_thicknesses)
+            max_slider_val = max(max_slider_val, times_thicknesses.iloc[:, 1].values[-1])
+        else:
+            arrays = read
+            max_slider_val = len(diff_rpp_rss)
+
+        print('Sample: ', arrays['meta_data'])
+        sample_name_list.append(arrays['meta_data'])
+        diffdata_list.append(diff_rpp_rss)
+
+    if module is loading_data:
+        return diffdata_list, thickness_list, sample_name_list, max_slider_val
+
+    return diffdata_list, sample_name_list, max_slider_val
+
+
+if __name__=='__main__':
+
+    num = int(input('Enter the number of directories: '))
+    data_for_plotting = load_data(directories=filepath(num))
@@ -0,0 +1,144 @@
+import json
+import atexit
+import functools
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter
+
+from numpy import array, percentile
+
+"""
+Opt-in timing of the stages of Plotting and of the loaders, to find where a slow GUI spends its time.
+Each stage keeps its latest durations in a rolling window, summarised as p50/p95/p99.
+
+    profiler = StageProfiler(overlay=True, dump_file='stages.json')
+    data = load_data(directories=folders, profiler=profiler)
+    plot_object = Plotting(*data, profiler=profiler)
+
+Stages of Plotting (see instrument):
+    draw_data             slider callback, the lines and the rendering
+    update_cumulative_lines, draw_lod_lines
+                          building the lines of the cumulative plots
+    set_segments          LineCollection.set_segments
+    colormap              mapping the line times to colours, during the draws
+    render                blitting, or asking for a redraw
+    figure_draw           full draw of the figure by the canvas
+    axes_func, view_func  radio buttons
+    append_rows           rows of a live run
+"""
+
+
+class StageProfiler:
+
+    """
+    Rolling latency histograms per named stage.
+
+    """
+
+    def __init__(self, window = 1000, overlay = False, dump_file = None):
+        """
+
+        :param window: no of latest durations kept per stage
+        :param overlay: shows the percentiles on the figure of an instrumented Plotting
+        :param dump_file: JSON file the percentiles are written to when python exits
+        """
+        self.window = window
+        self.overlay = overlay
+        # name: deque of the latest durations in seconds
+        self.durations = {}
+        # name: no of calls since the start
+        self.counts = {}
+        # overlay text, made by instrument
+        self.text = None
+
+        if dump_file:
+            atexit.register(self.dump, dump_file)
+
+    def record(self, name, seconds):
+        if name not in self.durations:
+            self.durations[name] = deque(maxlen=self.window)
+            self.counts[name] = 0
+        self.durations[name].append(seconds)
+        self.counts[name] = self.counts[name] + 1
+
+    @contextmanager
+    def stage(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, perf_counter() - start)
+
+    def wrap(self, name, function):
+        """
+
+        :return: function timed as the stage name
+        """
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(name, perf_counter() - start)
+
+        return timed
+
+    def percentiles(self):
+        """
+
+        :return: dict of stage: {'count', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'} over the window
+        """
+        summary = {}
+        for name, durations in self.durations.items():
+            milliseconds = 1e3*array(durations)
+            p50, p95, p99 = percentile(milliseconds, [50, 95, 99])
+            summary[name] = {'count': self.counts[name], 'p50_ms': float(p50), 'p95_ms': float(p95),
+                             'p99_ms': float(p99), 'max_ms': float(milliseconds.max())}
+
+        return summary
+
+    def report(self):
+        """
+
+        :return: table of the percentiles, one line per stage
+        """
+        lines = ['%-24s %7s %8s %8s %8s' % ('stage (ms)', 'count', 'p50', 'p95', 'p99')]
+        lines.extend(['%-24s %7d %8.2f %8.2f %8.2f' % (name, i['count'], i['p50_ms'], i['p95_ms'], i['p99_ms'])
+                      for name, i in sorted(self.percentiles().items())])
+
+        return '\n'.join(lines)
+
+    def dump(self, filename):
+        with open(filename, 'w') as f:
+            json.dump({'window': self.window, 'stages': self.percentiles()}, f, indent=1)
+        print('Stage timings written to', filename)
+
+    def instrument(self, plot_object):
+        """
+        Times the stages of a Plotting, by wrapping its methods on the instance. To be called before the
+        callbacks are connected, as Plotting does when given a profiler.
+
+        :return: None
+        """
+        for name in ('draw_data', 'update_cumulative_lines', 'draw_lod_lines', 'render', 'axes_func', 'view_func',
+                     'append_rows'):
+            setattr(plot_object, name, self.wrap(name, getattr(plot_object, name)))
+
+        for collection in plot_object.data_segments:
+            collection.set_segments = self.wrap('set_segments', collection.set_segments)
+            collection.update_scalarmappable = self.wrap('colormap', collection.update_scalarmappable)
+
+        # the canvas calls figure.draw for every full draw
+        plot_object.fig.draw = self.wrap('figure_draw', plot_object.fig.draw)
+
+        if self.overlay:
+            self.text = plot_object.fig.text(0.005, 0.995, '', va='top', family='monospace', fontsize=8,
+                                             animated=plot_object.blit)
+            render = plot_object.render
+
+            def render_with_overlay():
+                self.text.set_text(self.report())
+                render()
+
+            plot_object.render = render_with_overlay
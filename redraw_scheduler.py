@@ -0,0 +1,91 @@
+from time import perf_counter
+from matplotlib.backend_bases import TimerBase
+
+"""
+Coalescing of slider events so that redraws never pile up behind the mouse.
+"""
+
+
+class RedrawScheduler:
+
+    """
+    Sits between a widget's on_changed and the drawing callback.
+    Each event only stores its value; a single shot timer then calls the callback with the latest value,
+    at most max_fps times per second. Values replaced before being drawn are counted as dropped.
+
+    On non-interactive backends (e.g. Agg) timers never fire, so each event is drawn straight away.
+
+    """
+
+    def __init__(self, canvas, callback, max_fps = 30):
+        """
+
+        :param canvas: figure canvas providing the timer
+        :param callback: function called with the latest value
+        :param max_fps: maximum no of calls per second
+        """
+        self.callback = callback
+        self.min_interval = 1.0/max_fps
+
+        self.pending = None
+        self.last_call = None
+
+        # counters
+        self.submitted = 0
+        self.drawn = 0
+        self.dropped = 0
+
+        self.timer = canvas.new_timer()
+        self.timer.single_shot = True
+        self.timer.add_callback(self.fire)
+        # the base class is what backends without an event loop return
+        self.synchronous = type(self.timer) is TimerBase
+
+    def submit(self, value):
+        """
+        To be connected to the widget, e.g. slider.on_changed(scheduler.submit)
+
+        :param value: new value of the widget
+        :return: None
+        """
+        self.submitted += 1
+
+        if self.pending is not None:
+            # the previous value has not been drawn yet and never will be
+            self.dropped += 1
+            self.pending = value
+            return
+
+        self.pending = value
+        if self.synchronous:
+            self.fire()
+            return
+
+        wait = 0 if self.last_call is None else self.last_call + self.min_interval - perf_counter()
+        self.timer.start(max(1, int(wait*1000)))
+
+    def fire(self):
+        """
+        Calls the callback with the latest value, if there is one.
+        """
+        if self.pending is None:
+            return
+
+        value, self.pending = self.pending, None
+        self.last_call = perf_counter()
+        self.callback(value)
+        self.drawn += 1
+
+    def flush(self):
+        """
+        Draws the pending value now instead of waiting for the timer.
+        """
+        self.timer.stop()
+        self.fire()
+
+    def stats(self):
+        """
+
+        :return: dict of the counters
+        """
+        return {'submitted': self.submitted, 'drawn': self.drawn, 'dropped': self.dropped}
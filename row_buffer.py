@@ -0,0 +1,73 @@
+from numpy import empty
+
+"""
+Growable array of rows for data that keeps arriving during a run.
+"""
+
+
+class RowBuffer:
+
+    """
+    Array of rows which doubles its capacity when full, so appending is amortized O(1) per row.
+    view is the filled part and is a view, not a copy: take it again after each append.
+
+    """
+
+    def __init__(self, row_shape = (), dtype = float, capacity = 1024):
+        """
+
+        :param row_shape: shape of one row, () for a 1D buffer
+        :param dtype: dtype of the rows
+        :param capacity: initial no of rows
+        """
+        self.data = empty((max(capacity, 1),) + tuple(row_shape), dtype=dtype)
+        self.size = 0
+
+    @classmethod
+    def from_array(cls, array, extra = 1024):
+        """
+        Buffer holding a copy of array with room for extra rows.
+        """
+        buffer = cls(array.shape[1:], array.dtype, len(array) + extra)
+        buffer.append(array)
+        return buffer
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def view(self):
+        return self.data[:self.size]
+
+    def reserve(self, n_rows):
+        """
+        Room for n_rows rows after the filled part, growing the buffer if needed, for rows written in place.
+        They are added by commit. The returned view is stale once the buffer grows again.
+
+        :return: view of the n_rows rows
+        """
+        if self.size + n_rows > len(self.data):
+            capacity = len(self.data)
+            while capacity < self.size + n_rows:
+                capacity = capacity*2
+            data = empty((capacity,) + self.data.shape[1:], dtype=self.data.dtype)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+
+        return self.data[self.size:self.size + n_rows]
+
+    def commit(self, n_rows):
+        """
+        Adds the first n_rows rows written in the view of reserve.
+        """
+        self.size = self.size + n_rows
+
+    def append(self, rows):
+        """
+
+        :param rows: array of rows to append
+        :return: None
+        """
+        n_rows = len(rows)
+        self.reserve(n_rows)[:] = rows
+        self.commit(n_rows)
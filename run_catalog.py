@@ -0,0 +1,252 @@
+import os
+import json
+import zipfile
+import hashlib
+import argparse
+
+import numpy as np
+
+from dataset_cache import CACHE_DIR
+
+"""
+Catalog of the DART runs under a root directory, to pick the runs to load without typing their paths.
+Each <choice>diff_rpp_rss.npz found is described from the headers of its arrays, without decompressing the
+data: sample name, no of times and energies, time span, energy range, and the thickness reached from the
+<choice>times_thickness.csv next to it if any.
+The catalog is kept in a JSON index, and rescanning only reads the runs whose files changed (size or mtime).
+
+    python run_catalog.py /data/RDA --name C60 --min-times 500
+    directories = choose_directories('/data/RDA', no=2)
+"""
+
+NPZ_SUFFIX = 'diff_rpp_rss.npz'
+CSV_SUFFIX = 'times_thickness.csv'
+
+
+def index_file(root):
+    """
+
+    :return: JSON index of the catalog of root, in the cache directory of dataset_cache
+    """
+    key = hashlib.sha1(os.path.abspath(root).encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, 'catalog_%s.json' % key)
+
+
+def npy_header(f):
+    """
+    Reads the header of a .npy stream, leaving f at the start of the data.
+
+    :return: shape, fortran_order, dtype, or None for the versions of the format without a public reader
+    """
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        return np.lib.format.read_array_header_1_0(f)
+    if version == (2, 0):
+        return np.lib.format.read_array_header_2_0(f)
+
+    return None
+
+
+def npy_shape(zip_file, member):
+    """
+    Reads only the header of an array of an npz.
+
+    :return: shape, dtype
+    """
+    with zip_file.open(member) as f:
+        header = npy_header(f)
+        if header is not None:
+            shape, _, dtype = header
+        else:
+            f.seek(0)
+            array = np.lib.format.read_array(f, allow_pickle=True)
+            shape, dtype = array.shape, array.dtype
+
+    return shape, dtype
+
+
+def npy_array(zip_file, member):
+    """
+    Reads a small array of an npz, e.g. the times.
+    """
+    with zip_file.open(member) as f:
+        return np.lib.format.read_array(f, allow_pickle=True)
+
+
+def file_state(filename):
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def describe_run(npz_filename):
+    """
+
+    :return: dict of the metadata of a run
+    """
+    folder, name = os.path.split(npz_filename)
+    choice = name[:-len(NPZ_SUFFIX)]
+    csv_filename = os.path.join(folder, choice + CSV_SUFFIX)
+
+    with zipfile.ZipFile(npz_filename) as zip_file:
+        (n_times, n_energies), dtype = npy_shape(zip_file, 'values.npy')
+        times = npy_array(zip_file, 'index.npy')
+        energies = npy_array(zip_file, 'col_names.npy').astype(np.float64)
+        sample = npy_array(zip_file, 'meta_data.npy')
+
+    entry = {'npz': npz_filename, 'folder': os.path.join(folder, ''), 'choice': choice,
+             'state': file_state(npz_filename), 'sample': str(sample.item() if sample.ndim == 0 else sample),
+             'n_times': int(n_times), 'n_energies': int(n_energies), 'dtype': str(dtype),
+             'time_start': float(times[0]) if len(times) else None, 'time_stop': float(times[-1]) if len(times) else None,
+             'energy_min': float(energies.min()), 'energy_max': float(energies.max()),
+             'csv': None, 'csv_state': None, 'thickness_max': None}
+
+    if os.path.exists(csv_filename):
+        entry['csv'] = csv_filename
+        entry['csv_state'] = file_state(csv_filename)
+        # only here, so that importing the catalog (e.g. in lazy_dataset) does not import pandas
+        import pandas as pd
+
+        # thicknesses are the 2nd column, as in loading_data
+        thicknesses = pd.read_csv(csv_filename, usecols=[1]).iloc[:, 0]
+        entry['thickness_max'] = float(thicknesses.max()) if len(thicknesses) else None
+
+    return entry
+
+
+def scan(root, index = None):
+    """
+    Finds the runs under root and updates the index, reading only the runs which are new or changed.
+
+    :param root: directory to walk
+    :param index: JSON index file, index_file(root) by default
+    :return: list of the entries of the runs, sorted by path
+    """
+    index = index or index_file(root)
+    known = {}
+    if os.path.exists(index):
+        with open(index) as f:
+            known = {i['npz']: i for i in json.load(f)['runs']}
+
+    entries = []
+    n_read = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if not name.endswith(NPZ_SUFFIX):
+                continue
+            npz_filename = os.path.join(dirpath, name)
+            entry = known.get(npz_filename)
+
+            csv_filename = os.path.join(dirpath, name[:-len(NPZ_SUFFIX)] + CSV_SUFFIX)
+            csv_state = file_state(csv_filename) if os.path.exists(csv_filename) else None
+            if entry is None or entry['state'] != file_state(npz_filename) or entry['csv_state'] != csv_state:
+                try:
+                    entry = describe_run(npz_filename)
+                except (OSError, KeyError, ValueError, zipfile.BadZipFile) as error:
+                    print('Skipping', npz_filename, error)
+                    continue
+                n_read = n_read + 1
+            entries.append(entry)
+
+    os.makedirs(os.path.dirname(os.path.abspath(index)), exist_ok=True)
+    tmp_index = index + '.tmp%d' % os.getpid()
+    with open(tmp_index, 'w') as f:
+        json.dump({'root': os.path.abspath(root), 'runs': entries}, f)
+    os.replace(tmp_index, index)
+
+    print('Catalog of %s: %d runs, %d read' % (root, len(entries), n_read))
+
+    return entries
+
+
+def filter_runs(entries, name = None, choice = None, min_times = None, time_span = None, energy = None,
+                with_thickness = False):
+    """
+
+    :param name: text in the sample name or in the path, case insensitive
+    :param choice: prefix of the files, e.g. 'selected_'
+    :param min_times: least no of time rows
+    :param time_span: (start, stop) in minutes which the run must cover
+    :param energy: energy which must be within the energy range of the run
+    :param with_thickness: only the runs with a times_thickness.csv
+    :return: list of the matching entries
+    """
+    selected = []
+    for entry in entries:
+        if name is not None and name.lower() not in (entry['sample'] + ' ' + entry['npz']).lower():
+            continue
+        if choice is not None and entry['choice'] != choice:
+            continue
+        if min_times is not None and entry['n_times'] < min_times:
+            continue
+        if time_span is not None and (entry['time_start'] is None or entry['time_start'] > time_span[0] or
+                                      entry['time_stop'] < time_span[1]):
+            continue
+        if energy is not None and not entry['energy_min'] <= energy <= entry['energy_max']:
+            continue
+        if with_thickness and entry['csv'] is None:
+            continue
+        selected.append(entry)
+
+    return selected
+
+
+def describe(entries):
+    """
+
+    :return: table of the entries, one numbered line per run
+    """
+    lines = ['%3s  %-30s %7s %7s %16s %16s %9s  %s' % ('no', 'sample', 'times', 'points', 'time (min)',
+                                                       'energy', 'thickness', 'folder')]
+    for no, i in enumerate(entries):
+        time_span = '%0.1f-%0.1f' % (i['time_start'], i['time_stop']) if i['time_start'] is not None else '-'
+        thickness = '%0.1f' % i['thickness_max'] if i['thickness_max'] is not None else '-'
+        lines.append('%3d  %-30s %7d %7d %16s %16s %9s  %s' % (no, i['sample'][:30], i['n_times'], i['n_energies'],
+                                                               time_span, '%0.2f-%0.2f' % (i['energy_min'],
+                                                                                           i['energy_max']),
+                                                               thickness, i['folder']))
+
+    return '\n'.join(lines)
+
+
+def choose_directories(root, no = 1, **filters):
+    """
+    Catalog based replacement of datafile_destinations.filepath: lists the runs under root matching the
+    filters of filter_runs and asks for their numbers.
+
+    :param root: directory to scan
+    :param no: no of runs to choose
+    :return: list of the directories ending with /, for load_data
+    """
+    entries = filter_runs(scan(root), **filters)
+    if not entries:
+        print('No runs found')
+        return []
+    print(describe(entries))
+
+    chosen = []
+    while len(chosen) < no:
+        answer = input('Enter the no of run %d of %d: ' % (len(chosen) + 1, no)).strip()
+        if not answer.isdigit() or int(answer) >= len(entries):
+            print('Not a run no')
+            continue
+        chosen.append(entries[int(answer)]['folder'])
+
+    return chosen
+
+
+if __name__=='__main__':
+
+    parser = argparse.ArgumentParser(description='Lists the DART runs under a directory.')
+    parser.add_argument('root')
+    parser.add_argument('--index', default=None, help='JSON index file')
+    parser.add_argument('--name', default=None, help='text in the sample name or the path')
+    parser.add_argument('--choice', default=None, help='prefix of the files, e.g. selected_')
+    parser.add_argument('--min-times', type=int, default=None)
+    parser.add_argument('--energy', type=float, default=None, help='energy the runs must cover')
+    parser.add_argument('--with-thickness', action='store_true')
+    args = parser.parse_args()
+
+    runs = filter_runs(scan(args.root, args.index), name=args.name, choice=args.choice, min_times=args.min_times,
+                       energy=args.energy, with_thickness=args.with_thickness)
+    print(describe(runs))
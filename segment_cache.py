@@ -0,0 +1,199 @@
+from mmap import mmap
+
+from numpy import absolute, asarray, column_stack, empty, finfo, float64, maximum, ndarray
+
+from row_buffer import RowBuffer
+
+"""
+Precomputed line segments of |delrho| for the LineCollections of Plotting.
+"""
+
+
+def abs_max(values, block_rows = 1024):
+    """
+    Maximum of |values| computed block by block so that the whole absolute matrix is never allocated.
+
+    :param values: 2D array of the data
+    :param block_rows: no of rows to take at a time
+    :return: maximum absolute value
+    """
+    max_val = 0.0
+    for start in range(0, len(values), block_rows):
+        max_val = max(max_val, float(absolute(values[start:start + block_rows]).max()))
+
+    return max_val
+
+
+class SegmentCache:
+
+    """
+    Holds the lines of one sample as a contiguous (times, energies, 2) float array,
+    [:, :, 0] being the energy axis and [:, :, 1] being |delrho|. The array is float32 for data loaded as
+    complex64 or magnitude32 (see loading_data_v2.PRECISIONS), float64 otherwise.
+    The rows are then zero-copy views which LineCollection and Path use without copying.
+
+    If the array would need more than max_bytes, nothing is stored and each line is
+    computed from the data when it is asked for.
+
+    |delrho| is clipped from below at floor, once, so that log scales never meet non-positive values.
+
+    """
+
+    def __init__(self, values, energy_ev, max_bytes = 512*2**20, known_abs_max = None, floor = 0.0):
+        """
+
+        :param values: 2D (times, energies) complex array of the sample
+        :param energy_ev: energy axis of the lines
+        :param max_bytes: memory budget of the array. None or 0 for always computing the lines.
+        :param known_abs_max: max of |values| if already known, e.g. from a file header, so that lazy
+                              caches do not read the whole data for it
+        :param floor: lowest |delrho| of the lines, e.g. the lower y limit of the plots
+        """
+
+        self.values = values
+        self.floor = floor
+        # float type of the segments, the precision of the data
+        self.dtype = finfo(values.dtype).dtype
+        self.energy_ev = asarray(energy_ev, dtype=float64)
+        self.max_bytes = max_bytes
+        # created on the first append only
+        self.buffer = None
+
+        n_times, n_energies = values.shape
+        self.nbytes = n_times*n_energies*2*self.dtype.itemsize
+        self.cached = bool(max_bytes) and self.nbytes <= max_bytes
+
+        if self.cached:
+            self.segments = empty((n_times, n_energies, 2), dtype=self.dtype)
+            self.segments[:, :, 0] = self.energy_ev
+            self.magnitude(values, out=self.segments[:, :, 1])
+            self.abs_max = float(self.segments[:, :, 1].max()) if n_times else 0.0
+        else:
+            self.segments = None
+            self.nbytes = 0
+            self.abs_max = abs_max(values) if known_abs_max is None else known_abs_max
+
+    def __len__(self):
+        return len(self.values)
+
+    def magnitude(self, values, out = None):
+        """
+
+        :return: |values| clipped at floor
+        """
+        return maximum(absolute(values, out=out), self.floor, out=out)
+
+    def append(self, values):
+        """
+        Follows data which has grown by rows appended at the end, e.g. during a live run.
+        The cache is dropped, and lines computed lazily, once it would exceed max_bytes.
+
+        :param values: the whole grown data, whose first len(self) rows are the ones already known
+        :return: None
+        """
+        new_values = values[len(self.values):]
+        self.values = values
+        if len(new_values) == 0:
+            return
+
+        self.abs_max = max(self.abs_max, float(absolute(new_values).max()))
+
+        if not self.cached:
+            return
+
+        new_bytes = new_values.shape[0]*new_values.shape[1]*2*self.dtype.itemsize
+        if self.nbytes + new_bytes > self.max_bytes:
+            print('Segment cache over the budget, switching to lazy')
+            self.cached = False
+            self.segments = None
+            self.buffer = None
+            self.nbytes = 0
+            return
+
+        if self.buffer is None:
+            self.buffer = RowBuffer.from_array(self.segments, extra=len(self.segments))
+
+        new_segments = empty(new_values.shape + (2,), dtype=self.dtype)
+        new_segments[:, :, 0] = self.energy_ev
+        self.magnitude(new_values, out=new_segments[:, :, 1])
+        self.buffer.append(new_segments)
+        self.segments = self.buffer.view
+        self.nbytes = self.nbytes + new_bytes
+
+    def row(self, row):
+        """
+
+        :param row: row of the data
+        :return: (energies, 2) array of the line
+        """
+        if self.cached:
+            return self.segments[row]
+
+        return column_stack([self.energy_ev.astype(self.dtype, copy=False), self.magnitude(self.values[row])])
+
+    def magnitudes(self, rows):
+        """
+
+        :param rows: array of rows of the data
+        :return: (rows, energies) array of |delrho|
+        """
+        if self.cached:
+            return self.segments[rows, :, 1]
+
+        return self.magnitude(self.values[rows])
+
+    def rows(self, start = 0, stop = None, step = 1):
+        """
+
+        :return: (lines, energies, 2) array of the lines of values[start:stop:step]
+        """
+        if self.cached:
+            return self.segments[start:stop:step]
+
+        magnitudes = self.magnitude(self.values[start:stop:step])
+        segments = empty(magnitudes.shape + (2,), dtype=self.dtype)
+        segments[:, :, 0] = self.energy_ev
+        segments[:, :, 1] = magnitudes
+
+        return segments
+
+
+def memory_mapped(values):
+    """
+
+    :return: True if values is, or is a view of, a memory map, e.g. the DataFrames of mmap_data.load_data
+    """
+    base = values
+    while base is not None:
+        if isinstance(base, mmap):
+            return True
+        base = getattr(base, 'base', None)
+
+    return False
+
+
+def build_segment_caches(values_list, energy_ev, cache_budget = 512*2**20, abs_max_list = None, floor = 0.0):
+    """
+    Builds a SegmentCache for each sample. The budget is shared: samples are cached in order while the
+    budget lasts and the remaining ones compute their lines lazily.
+
+    :param values_list: list of 2D data arrays
+    :param energy_ev: energy axis common to all the samples
+    :param cache_budget: total no of bytes allowed for the cached arrays
+    :param abs_max_list: known max of |values| of each sample, None where unknown
+    :param floor: lowest |delrho| of the lines
+    :return: list of SegmentCache
+    """
+    caches = []
+    remaining = cache_budget or 0
+    abs_max_list = abs_max_list or [None]*len(values_list)
+
+    for values, known_abs_max in zip(values_list, abs_max_list):
+        # rows read on demand, e.g. lazy_dataset.LazyRows or memory maps, are not read all at once to fill a cache
+        max_bytes = remaining if isinstance(values, ndarray) and not memory_mapped(values) else 0
+        cache = SegmentCache(values, energy_ev, max_bytes=max_bytes, known_abs_max=known_abs_max, floor=floor)
+        remaining = remaining - cache.nbytes
+        caches.append(cache)
+        print('Segment cache: %0.1f MB' % (cache.nbytes/2**20) if cache.cached else 'Segment cache: lazy')
+
+    return caches
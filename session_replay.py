@@ -0,0 +1,171 @@
+import json
+import argparse
+from time import perf_counter, sleep, time
+
+from numpy import array, percentile
+
+"""
+Recording of the widget events of a Plotting session and their replay on a headless Plotting, to turn a slow
+interactive session into a repeatable performance test.
+
+Recording, in the script showing the plots:
+    recorder = SessionRecorder(plot_object, 'session.jsonl', meta={'directories': test_folders})
+    plt.show()
+
+Replay, timing each event:
+    python session_replay.py session.jsonl --speed max --out replay.json
+
+The file has one JSON object per line: a header {"type": "session", "start", "meta"} and then the events
+{"t": seconds since the start, "widget": "time_slider", "radiobutton" or "viewbutton", "value"}.
+"""
+
+WIDGETS = ('time_slider', 'radiobutton', 'viewbutton')
+
+
+class SessionRecorder:
+
+    """
+    Appends the events of the slider and the radio buttons of a Plotting to a file as they happen.
+    The times are those at which the callbacks run, after the ones Plotting connected first.
+
+    """
+
+    def __init__(self, plot_object, filename, meta = {}):
+        """
+
+        :param plot_object: Plotting to record
+        :param filename: JSON lines file, overwritten
+        :param meta: anything needed to replay, e.g. the directories and the Plotting options
+        """
+        self.file = open(filename, 'w')
+        self.start = perf_counter()
+        self.n_events = 0
+        self.write({'type': 'session', 'start': time(), 'meta': meta})
+
+        plot_object.time_slider.on_changed(lambda value: self.event('time_slider', float(value)))
+        plot_object.radiobutton.on_clicked(lambda label: self.event('radiobutton', label))
+        plot_object.viewbutton.on_clicked(lambda label: self.event('viewbutton', label))
+        plot_object.fig.canvas.mpl_connect('close_event', lambda event: self.close())
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + '\n')
+        # kept even if the session crashes
+        self.file.flush()
+
+    def event(self, widget, value):
+        if self.file.closed:
+            return
+        self.write({'t': perf_counter() - self.start, 'widget': widget, 'value': value})
+        self.n_events = self.n_events + 1
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+            print('Recorded %d events' % self.n_events)
+
+
+def load_session(filename):
+    """
+
+    :return: meta of the header, list of the events
+    """
+    with open(filename) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    meta = records[0].get('meta', {}) if records and records[0].get('type') == 'session' else {}
+
+    return meta, [i for i in records if 'widget' in i]
+
+
+def apply_event(plot_object, event):
+    """
+    Gives the event to its widget, as a user would.
+    """
+    widget = getattr(plot_object, event['widget'])
+    if event['widget'] == 'time_slider':
+        widget.set_val(event['value'])
+    else:
+        widget.set_active([i.get_text() for i in widget.labels].index(event['value']))
+
+
+def replay(plot_object, events, speed = 'max', profiler = None):
+    """
+    Feeds the events to plot_object and times them. On the Agg backend the canvas draws straight away,
+    so the time of an event is its frame latency.
+
+    :param plot_object: Plotting, normally on the Agg backend
+    :param events: events of load_session
+    :param speed: 'max' for one event after the other, or a factor of the recorded speed, 1 being the original
+    :param profiler: StageProfiler to record the latencies in, by widget, e.g. the one given to plot_object
+    :return: list of the latency of each event in seconds
+    """
+    latencies = []
+    start = perf_counter()
+
+    for event in events:
+        if speed != 'max':
+            delay = start + event['t']/float(speed) - perf_counter()
+            if delay > 0:
+                sleep(delay)
+
+        event_start = perf_counter()
+        apply_event(plot_object, event)
+        latency = perf_counter() - event_start
+        latencies.append(latency)
+        if profiler is not None:
+            profiler.record('event ' + event['widget'], latency)
+
+    return latencies
+
+
+def summary(latencies):
+    """
+
+    :return: dict of the no of events and their p50, p95, p99, max and total in ms
+    """
+    milliseconds = 1e3*array(latencies) if latencies else array([0.0])
+    p50, p95, p99 = percentile(milliseconds, [50, 95, 99])
+
+    return {'events': len(latencies), 'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99),
+            'max_ms': float(milliseconds.max()), 'total_ms': float(milliseconds.sum())}
+
+
+if __name__=='__main__':
+
+    import matplotlib
+    matplotlib.use('Agg')
+
+    parser = argparse.ArgumentParser(description='Replays a recorded Plotting session headless and times it.')
+    parser.add_argument('session', help='JSON lines file of SessionRecorder')
+    parser.add_argument('--directories', nargs='+', default=None, help='instead of the recorded ones')
+    parser.add_argument('--choice', default='selected_')
+    parser.add_argument('--speed', default='max', help="'max' or a factor of the recorded speed")
+    parser.add_argument('--out', default=None, help='JSON file of the latencies and of the stages of Plotting')
+    args = parser.parse_args()
+
+    from loading_data_v2 import load_data
+    from single_multiplelines_plotting_v4 import Plotting
+    from profiling import StageProfiler
+
+    meta, events = load_session(args.session)
+    directories = args.directories or meta.get('directories')
+    if not directories:
+        parser.error('the session does not record its directories, give --directories')
+
+    profiler = StageProfiler()
+    diffdata_list, sample_list, max_slider_val = load_data(choice=args.choice, directories=directories)
+    plot_object = Plotting(diffdata_list, sample_list, max_slider_val=max_slider_val, profiler=profiler,
+                           **meta.get('plotting_kwargs', {}))
+    plot_object.fig.canvas.draw()
+
+    latencies = replay(plot_object, events, args.speed, profiler)
+    results = summary(latencies)
+    print('Replayed %d events: p50 %0.1f ms, p95 %0.1f ms, p99 %0.1f ms' % (results['events'], results['p50_ms'],
+                                                                          results['p95_ms'], results['p99_ms']))
+    print(profiler.report())
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'session': args.session, 'speed': args.speed, 'latency': results,
+                       'stages': profiler.percentiles()}, f, indent=1)
+        print('Results written to', args.out)
@@ -0,0 +1,238 @@
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+"""
+Shared memory ring buffer of spectrum rows between the DART processing process (writer) and the GUI (reader),
+for acquisition rates where even a socket adds too many copies.
+
+Layout of the block:
+    header       capacity, n_energies, write_index, read_index, overflow policy, sample name, claim_index
+                 (128 bytes)
+    energies     float64[n_energies]
+    times        float64[capacity]
+    rows         complex128[capacity, n_energies]
+write_index and read_index count rows since the start and only grow; row k is at slot k % capacity.
+The writer raises claim_index to the end of the rows it is about to write, fills their slots and then moves
+write_index. The reader copies the rows and then checks claim_index for the ones overwritten meanwhile, before
+moving read_index.
+One writer and one reader per buffer.
+
+Overflow policies, when the writer is capacity rows ahead of the reader:
+    'drop_oldest'   the writer goes on and the reader skips the overwritten rows
+    'block'         the writer waits for the reader
+"""
+
+HEADER_DTYPE = np.dtype([('capacity', '<u8'), ('n_energies', '<u8'), ('write_index', '<u8'), ('read_index', '<u8'),
+                         ('block', 'u1'), ('sample_name', 'S64'), ('claim_index', '<u8')])
+HEADER_SIZE = 128
+
+
+def layout(buffer, capacity, n_energies):
+    """
+
+    :return: header, energies, times and rows arrays on the shared buffer
+    """
+    header = np.ndarray((), dtype=HEADER_DTYPE, buffer=buffer)
+    energies = np.ndarray((n_energies,), dtype='<f8', buffer=buffer, offset=HEADER_SIZE)
+    offset = HEADER_SIZE + 8*n_energies
+    times = np.ndarray((capacity,), dtype='<f8', buffer=buffer, offset=offset)
+    rows = np.ndarray((capacity, n_energies), dtype='<c16', buffer=buffer, offset=offset + 8*capacity)
+
+    return header, energies, times, rows
+
+
+def slots(start, stop, capacity):
+    """
+    Slices of the ring for rows start to stop, two when they wrap around.
+    """
+    first, last = start % capacity, stop % capacity
+    if stop - start == 0:
+        return []
+    if first < last or last == 0:
+        return [slice(first, last or capacity)]
+
+    return [slice(first, capacity), slice(0, last)]
+
+
+class RingBufferWriter:
+
+    def __init__(self, name, capacity, energies, sample_name = '', overflow = 'drop_oldest'):
+        """
+        Creates the shared memory block.
+
+        :param name: name of the block, given to the reader
+        :param capacity: no of rows held
+        :param energies: energy axis of the rows
+        :param sample_name: shown by the reader
+        :param overflow: 'drop_oldest' or 'block'
+        """
+        n_energies = len(energies)
+        size = HEADER_SIZE + 8*n_energies + 8*capacity + 16*capacity*n_energies
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self.header, self.energies, self.times, self.rows = layout(self.shm.buf, capacity, n_energies)
+        self.header['capacity'] = capacity
+        self.header['n_energies'] = n_energies
+        self.header['write_index'] = 0
+        self.header['read_index'] = 0
+        self.header['claim_index'] = 0
+        self.header['block'] = overflow == 'block'
+        self.header['sample_name'] = str(sample_name).encode()[:64]
+        self.energies[:] = energies
+
+        self.capacity = capacity
+        self.block = overflow == 'block'
+
+    def write(self, times, values, timeout = None):
+        """
+
+        :param times: 1D array of times
+        :param values: 2D (rows, energies) complex array
+        :param timeout: seconds to wait for the reader with the 'block' policy, None for ever
+        :return: None
+        """
+        # chunks of at most capacity rows
+        for start in range(0, len(times), self.capacity):
+            chunk_times = times[start:start + self.capacity]
+            chunk_values = values[start:start + self.capacity]
+            n_rows = len(chunk_times)
+
+            write_index = int(self.header['write_index'])
+            if self.block:
+                waited = time.perf_counter()
+                while write_index + n_rows - int(self.header['read_index']) > self.capacity:
+                    if timeout is not None and time.perf_counter() - waited > timeout:
+                        raise TimeoutError('Ring buffer full, the reader is not keeping up')
+                    time.sleep(0.001)
+
+            # the slots of the rows up to claim_index may be overwritten from now on
+            self.header['claim_index'] = write_index + n_rows
+            done = 0
+            for part in slots(write_index, write_index + n_rows, self.capacity):
+                n_part = part.stop - part.start
+                self.times[part] = chunk_times[done:done + n_part]
+                self.rows[part] = chunk_values[done:done + n_part]
+                done = done + n_part
+
+            # publishing the rows once they are written
+            self.header['write_index'] = write_index + n_rows
+
+    def close(self, unlink = True):
+        del self.header, self.energies, self.times, self.rows
+        self.shm.close()
+        if unlink:
+            # a reader sharing the resource tracker of this process (same process, or forked from it) has
+            # unregistered the block, and unlink would fail in the tracker
+            resource_tracker.register(self.shm._name, 'shared_memory')
+            self.shm.unlink()
+
+
+class RingBufferReader:
+
+    def __init__(self, name):
+        """
+        Attaches to the block made by a RingBufferWriter.
+        """
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # before python 3.13 attaching registers the block, which gets unlinked when this process ends.
+            # The writer registers it again before unlinking it.
+            self.shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+        self.capacity = int(header['capacity'])
+        self.header, self.energies, self.times, self.rows = layout(self.shm.buf, self.capacity,
+                                                                   int(header['n_energies']))
+        self.sample_name = self.header['sample_name'].item().decode()
+        self.lost = 0
+
+    def new_rows(self):
+        """
+        Rows written since the last read, as views on the shared memory (one or two parts when they wrap around).
+        Call done() once they are copied.
+
+        :return: list of (times, values) views
+        """
+        write_index = int(self.header['write_index'])
+        read_index = int(self.header['read_index'])
+
+        if write_index - read_index > self.capacity:
+            # overwritten by the writer (drop_oldest)
+            self.lost = self.lost + write_index - read_index - self.capacity
+            read_index = write_index - self.capacity
+            self.header['read_index'] = read_index
+
+        self.reading = (read_index, write_index)
+
+        return [(self.times[part], self.rows[part]) for part in slots(read_index, write_index, self.capacity)]
+
+    def done(self):
+        """
+        Releases the rows of the last new_rows to the writer.
+
+        :return: no of those rows, from the first, the writer overwrote or started overwriting while they were
+                 being read
+        """
+        read_index, write_index = self.reading
+        overwritten = max(0, int(self.header['claim_index']) - self.capacity - read_index)
+        self.header['read_index'] = write_index
+
+        return min(overwritten, write_index - read_index)
+
+    def poll_into(self, plot_object, sample_index = 0):
+        """
+        Copies the new rows into the sample of plot_object, on the GUI thread. The rows overwritten while being
+        copied are left out and counted in lost.
+
+        :return: no of rows added
+        """
+        parts = self.new_rows()
+        n_rows = sum(len(i[0]) for i in parts)
+        if n_rows == 0:
+            self.done()
+            return 0
+
+        # one copy, straight into the buffers of the sample, checked by done before the rows are added
+        times, values = plot_object.reserve_rows(sample_index, n_rows)
+        done = 0
+        for part_times, part_values in parts:
+            n_part = len(part_times)
+            times[done:done + n_part] = part_times
+            if np.iscomplexobj(values):
+                values[done:done + n_part] = part_values
+            else:
+                # data loaded as magnitudes
+                np.absolute(part_values, out=values[done:done + n_part])
+            done = done + n_part
+
+        overwritten = self.done()
+        if overwritten:
+            self.lost = self.lost + overwritten
+            print('Ring buffer: %d rows were overwritten while being read, dropped' % overwritten)
+            # rare, moving the rows which are still good to the start
+            times[:n_rows - overwritten] = times[overwritten:]
+            values[:n_rows - overwritten] = values[overwritten:]
+
+        plot_object.commit_rows(sample_index, n_rows - overwritten)
+
+        return n_rows - overwritten
+
+    def attach(self, plot_object, sample_index = 0, interval_ms = 50):
+        """
+        Polls the buffer from the GUI event loop. Keep the returned timer referenced.
+
+        :return: timer
+        """
+        timer = plot_object.fig.canvas.new_timer(interval=interval_ms)
+        timer.add_callback(self.poll_into, plot_object, sample_index)
+        timer.start()
+
+        return timer
+
+    def close(self):
+        del self.header, self.energies, self.times, self.rows
+        self.shm.close()
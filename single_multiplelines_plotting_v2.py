@@ -2,12 +2,14 @@ import matplotlib.pyplot as plt
 from matplotlib import cm
 from matplotlib.widgets import Slider, RadioButtons
 from matplotlib.collections import LineCollection
+from matplotlib.path import Path
 from matplotlib.ticker import AutoMinorLocator, LogLocator
 
-from numpy import absolute, array, float16, column_stack, full, arange, round
+from numpy import absolute, array, float64, column_stack, full, arange, round
 import sys
 
 from loading_data import load_data
+from thickness_index import ThicknessIndex
 
 
 class Plotting:
@@ -21,11 +23,15 @@ class Plotting:
     
     version 2: Flattening the axes array
     
+    thickness_lookup: None for a slider of rows. 'nearest' or 'interpolate' for a slider of thickness in nm,
+    each sample then showing its row of the nearest thickness, or its spectrum interpolated between the rows
+    either side of the thickness (see thickness_index).
+    
     """
     
     
     def __init__(self, diffdata_list = [], thickness_list = [], sample_list = [], thickness_step=1, max_slider_val =
-    50):
+    50, thickness_lookup = None):
     
         # Initializing matplotlib properties
         self.cmap = cm.hsv_r # colormap
@@ -43,6 +49,12 @@ class Plotting:
         self.sizelist = [len(i) for i in self.thickness_list]
         # captures the different lengths of each sample's dataframe
         
+        self.thickness_lookup = thickness_lookup
+        # rows of each sample sorted by thickness, searched when the slider gives a thickness
+        self.thickness_indexes = [ThicknessIndex(i.iloc[:, 1].values) for i in self.thickness_list]
+        # no of lines of each cumulative plot drawn by draw_thickness, which only adds or removes the change
+        self.drawn_lines = [0]*len(sample_list)
+        
         if self.no_of_plots > 3:
             
             sys.exit("Max number allowed is 3 plots. Exiting...")
@@ -53,7 +65,7 @@ class Plotting:
         
 
         
-        self.energy_ev = array(diffdata_list[0].columns).astype(float16)
+        self.energy_ev = array(diffdata_list[0].columns).astype(float64)
         self.x_lim = (self.energy_ev.min(), self.energy_ev.max())
         self.y_lim = []
         
@@ -84,9 +96,9 @@ class Plotting:
                 self.ax[index].xaxis.set_tick_params(which='major', width=1, length=10)
                 
                 self.init_segments = [column_stack([self.energy_ev, full(shape=len(self.energy_ev), fill_value=1,
-                                                                     dtype=float16)])]
+                                                                     dtype=float64)])]
                 lincoll = LineCollection(segments=self.init_segments, linewidths=1.5, linestyles='solid',
-                                                         cmap=cm.get_cmap(self.cmap))
+                                                         cmap=self.cmap)
                 self.data_segments.append(lincoll)
                 
                 self.axis_collections.append(self.ax[index].add_collection(self.data_segments[index]))
@@ -106,12 +118,19 @@ class Plotting:
         # Adding slider
         axcolor = 'lightgoldenrodyellow'
         axthickness = self.fig.add_axes([0.2, 0.05, 0.65, 0.03], facecolor=axcolor)
-        self.thickness_slider = Slider(axthickness, label='', valmin=1 - self.thickness_step, valmax=max_slider_val,
-          valinit=1 - self.thickness_step, valfmt='%d', valstep=self.thickness_step)
-        
+        if thickness_lookup:
+            min_thickness = min(i.thicknesses[0] for i in self.thickness_indexes)
+            self.thickness_slider = Slider(axthickness, label='nm', valmin=min_thickness, valmax=max_slider_val,
+              valinit=min_thickness, valfmt='%0.1f')
+            self.draw_thickness(min_thickness)
+            self.thickness_slider.on_changed(self.draw_thickness)
         
-        self.draw_data()
-        self.thickness_slider.on_changed(self.draw_data)
+        else:
+            self.thickness_slider = Slider(axthickness, label='', valmin=1 - self.thickness_step,
+              valmax=max_slider_val, valinit=1 - self.thickness_step, valfmt='%d', valstep=self.thickness_step)
+            
+            self.draw_data()
+            self.thickness_slider.on_changed(self.draw_data)
         
 
         # Adding radio buttons
@@ -156,6 +175,63 @@ class Plotting:
     
     
     
+    def draw_thickness(self, slider_value=1.0):
+        """
+        Plots each sample at the thickness of the slider: the line at that thickness and the lines of the
+        rows up to it.
+        """
+        thickness = float(slider_value)
+        
+        idx = 0
+        for i in range(self.no_of_plots):
+            index = self.thickness_indexes[i]
+            
+            if self.thickness_lookup == 'interpolate':
+                before, after, weight = index.bracket(thickness)
+                values = self.diffdata_list[i].values
+                line = values[before]*(1 - weight) + values[after]*weight
+                rows = int(before) + 1
+            else:
+                row = index.nearest(thickness)
+                line = self.diffdata_list[i].values[row]
+                rows = int(row) + 1
+            
+            self.update_cumulative_lines(i, self.data_segments[idx+1], rows)
+            
+            singlesegments = [column_stack([self.energy_ev, absolute(line)])]
+            self.data_segments[idx].set_segments(singlesegments)
+            idx = idx+2
+        
+        self.fig.canvas.draw_idle()
+    
+    def update_cumulative_lines(self, i, collection, rows):
+        """
+        Brings the cumulative plot of sample i to the lines of iloc[:rows:thickness_step], making paths only
+        for the lines between the previous and the new slider position, as in single_multiplelines_plotting_v4.
+        
+        :param i: index of the sample
+        :param collection: LineCollection of the cumulative plot
+        :param rows: no of rows of the sample up to the slider value
+        :return: None
+        """
+        values = self.diffdata_list[i].values
+        new_lines = len(range(0, min(rows, self.sizelist[i]), self.thickness_step))
+        old_lines = self.drawn_lines[i]
+        paths = collection.get_paths()
+        
+        if old_lines == 0:
+            # removing the placeholder line of init_segments
+            del paths[:]
+        
+        if new_lines > old_lines:
+            paths.extend([Path(column_stack([self.energy_ev, absolute(values[line*self.thickness_step])])) for
+                          line in range(old_lines, new_lines)])
+        else:
+            del paths[new_lines:]
+        
+        collection.stale = True
+        self.drawn_lines[i] = new_lines
+    
     def axes_func(self, label='Linear'):
         if label == 'SemiLogY':
             print(self.radiobutton.value_selected)
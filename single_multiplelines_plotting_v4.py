@@ -3,12 +3,20 @@ from matplotlib import cm
 from matplotlib.widgets import Slider, RadioButtons
 from matplotlib.collections import LineCollection
 from matplotlib.ticker import AutoMinorLocator, LogLocator
-from matplotlib.artist import Artist
+from matplotlib.path import Path
+from matplotlib.transforms import Bbox
+from matplotlib.colors import LogNorm, Normalize
 
-from numpy import absolute, real, array, float16, column_stack, full, arange, round
-import sys
+from numpy import absolute, real, array, asarray, float64, iscomplexobj, column_stack, full, arange, round, minimum, maximum, flatnonzero
+from math import ceil, sqrt
 
 from loading_data_v2 import load_data
+from segment_cache import build_segment_caches
+from redraw_scheduler import RedrawScheduler
+from lod import select_lines, minmax_downsample, line_changes
+from row_buffer import RowBuffer
+from summary_metrics import SummaryMetrics
+from time_grid import rows_at
 
 """
 From v2. For data with no thicknesses.
@@ -17,7 +25,7 @@ From v2. For data with no thicknesses.
 class Plotting:
     
     """
-    Plots absolute value of delrho as a function of thickness for a maximum of 6 figures.
+    Plots absolute value of delrho as a function of thickness for any number of samples.
     Slider is used to change the thickness value.
     Left plot of a row plots only 1 line at the corresponding thickness.
     Right plot of a row plots this line and all the previous ones starting at 1 nm.
@@ -25,10 +33,47 @@ class Plotting:
     
     version 2: Flattening the axes array
     
+    Up to 3 samples are plotted one per row. More samples are laid out in a grid of several samples per row,
+    still 2 axes per sample (ax[2*i] and ax[2*i+1]), with the sample names as titles.
+    
+    incremental: the cumulative plots keep the lines already drawn and only add or remove
+    the lines between the previous and the new slider position.
+    
+    cache_budget: bytes allowed for the precomputed line segments (see segment_cache). Samples over the
+    budget, or all of them with cache_budget = None, compute their lines when drawn.
+    
+    blit: only the LineCollections, the time label and the slider are redrawn on a slider change,
+    over the cached background of each axis. Falls back to full redraws on backends that cannot blit.
+    
+    max_fps: slider events are coalesced to the latest value and drawn at most max_fps times per second
+    (see redraw_scheduler). None draws every event.
+    
+    max_lines: level of detail of the cumulative plots (see lod). When more lines than max_lines are due, only
+    max_lines of them are drawn, evenly spaced or, with lod_weighting = 'change', spaced by how much the spectrum
+    changes. max_points additionally reduces these lines to max_points points each, keeping the min and max.
+    
+    append_rows adds the rows of a live run to a sample (see live_stream and ingest_server).
+    
+    The View radio buttons switch the cumulative plots between Lines and a Heatmap of |delrho| against time and
+    energy, which is drawn once; the slider then only moves a cursor on it. The Y log scales of the
+    Linear/SemiLogY/SemiLogX/LogLog buttons become a log colour scale there.
+    
+    slider_mode: 'rows' for the slider to give the no of rows shown of every sample, or 'time' for a time in
+    minutes, each sample then showing its rows up to that time (found by binary search on its times).
+    time_grid.align_data puts the samples on a common time grid beforehand instead.
+    
+    profiler: a profiling.StageProfiler timing the callbacks and the drawing stages, with an optional overlay of
+    the latencies on the figure.
+    
+    trends: names of summary_metrics.METRICS, e.g. ('integrated', 'change'), to plot against time in a panel
+    under the samples, each normalised to its maximum, with a cursor following the slider. None for no panel.
+    
     """
     
     
-    def __init__(self, diffdata_list = [], sample_list = [], time_step = 1, max_slider_val = 50):
+    def __init__(self, diffdata_list = [], sample_list = [], time_step = 1, max_slider_val = 50, incremental = True,
+                 cache_budget = 512*2**20, blit = False, max_fps = None, max_lines = None, max_points = None,
+                 lod_weighting = 'even', trends = None, slider_mode = 'rows', profiler = None):
     
         # Initializing matplotlib properties
         self.cmap = cm.hsv_r # colormap
@@ -37,72 +82,115 @@ class Plotting:
         
         self.diffdata_list = diffdata_list
         # self.thickness_list = thickness_list
-        self.time_list = [diffdata_list[i].index.to_numpy() for i in range(len(diffdata_list))]
+        # DataFrames or the datasets of lazy_dataset, whose index is already an array
+        self.time_list = [asarray(diffdata_list[i].index) for i in range(len(diffdata_list))]
+        self.values_list = [diffdata_list[i].values for i in range(len(diffdata_list))]
         self.sample_names = sample_list
         
         self.time_step = time_step
         self.max_slider_val = max_slider_val
         self.no_of_plots = len(sample_list)
         
+        self.incremental = incremental
+        # no of lines currently drawn in the cumulative plot of each sample, 0 when showing init_segments
+        # and -1 when showing a level of detail subset
+        self.drawn_lines = [0]*self.no_of_plots
+        
+        self.max_lines = max_lines
+        self.max_points = max_points
+        # times of the lines of the cumulative plots, used for their colours
+        self.line_times = [self.time_list[i][::self.time_step] for i in range(len(self.time_list))]
+        
         # self.sizelist = [len(i) for i in self.thickness_list]
         self.sizelist = [len(i) for i in self.time_list]
-        # captures the different lengths of each sample's dataframe
         
-        if self.no_of_plots > 3:
-            
-            sys.exit("Max number allowed is 3 plots. Exiting...")
+        # 'Lines' or 'Heatmap' for the cumulative plots, heatmaps and their time cursors made on the first switch
+        self.view = 'Lines'
+        self.heatmaps = [None]*len(self.time_list)
+        self.cursors = [None]*len(self.time_list)
+        # growable copies of time_list and values_list, made when rows are first appended to a sample
+        self.buffers = [None]*len(self.time_list)
+        # captures the different lengths of each sample's dataframe
         
-        else:
-            ncols = 2
-            nrows = self.no_of_plots
+        # one sample per row up to 3, then a grid of about twice as many columns as rows
+        samples_per_row = ceil(self.no_of_plots/min(self.no_of_plots, ceil(sqrt(2*self.no_of_plots))))
+        ncols = 2*samples_per_row
+        nrows = ceil(self.no_of_plots/samples_per_row)
+        fontsize = 14 if samples_per_row == 1 else 10
         
 
         
-        self.energy_ev = array(diffdata_list[0].columns).astype(float16)
+        # the data may be stored at reduced precision (see loading_data_v2.PRECISIONS), the energy axis is not
+        self.energy_ev = array(diffdata_list[0].columns).astype(float64)
         self.x_lim = (self.energy_ev.min(), self.energy_ev.max())
         self.y_lim = []
         
-        self.fig, self.ax = plt.subplots(nrows=nrows, ncols=ncols, figsize=(16,16))
+        # lower y limit, also the value below which |delrho| is clipped for the log scales
+        self.y_min = 0.00001
+        
+        # lines of |delrho| precomputed once per sample
+        # loaders may give the max of |delrho| in the attrs of the DataFrames (see mmap_data)
+        self.caches = build_segment_caches(self.values_list, self.energy_ev, cache_budget,
+                                           [getattr(i, 'attrs', {}).get('abs_max') for i in diffdata_list],
+                                           floor=self.y_min)
+        
+        if max_lines and lod_weighting == 'change':
+            self.row_changes = [RowBuffer.from_array(line_changes(self.values_list[i])) for i in
+                                range(len(self.values_list))]
+        else:
+            self.row_changes = None
+        
+        self.fig, self.ax = plt.subplots(nrows=nrows, ncols=ncols, figsize=(16 if samples_per_row == 1 else
+                                                                           9*samples_per_row, 16), squeeze=False)
         self.ax = self.ax.flatten()
+        # the last row of the grid may not be full
+        [i.set_visible(False) for i in self.ax[2*self.no_of_plots:]]
+        self.ax = self.ax[:2*self.no_of_plots]
         # tight_layout = True, constrained_layout =True: cant use these with subplots_adjust
-        self.fig.subplots_adjust(left=0.1, bottom=0.2)
+        self.fig.subplots_adjust(left=0.1, bottom=0.32 if trends else 0.2)
+        if samples_per_row > 1:
+            # room for the titles and the colorbars
+            self.fig.subplots_adjust(hspace=0.45, wspace=0.4)
         self.fig.suptitle('DART results of ' + str(self.sample_names[0]), fontsize = 16, fontweight='bold', x=0.5, y=0.94)
         self.data_segments = []
         self.axis_collections = []
-        self.textvar =  self.fig.text(x = 0.3, y = 0.7, s = '')
+        # time label, created once and updated with set_text
+        self.textvar =  self.fig.text(x = 0.3, y = 0.85, s = '', fontsize = 15)
         
 
         index = 0
         for i, diff_rpp_rss, in zip(range(self.no_of_plots), diffdata_list):
         
         
-            y_lim = (0.00001, absolute(diff_rpp_rss.values).flatten().max())
+            y_lim = (self.y_min, self.caches[i].abs_max)
             # y_lim = (real(diff_rpp_rss.values).flatten().min(), real(diff_rpp_rss.values).flatten().max())
             self.y_lim.append(y_lim)
             
             for j in range(2):
                 self.ax[index].set_xlim(auto=True, xmin=self.x_lim[0], xmax=self.x_lim[1])
                 self.ax[index].set_ylim(auto=True, ymin=y_lim[0], ymax=y_lim[1])
-                self.ax[index].xaxis.set_label_text('Wavelength (nm)', fontweight='bold', fontsize=14)
-                self.ax[index].set_ylabel(r'|$\delta \rho$|', fontweight='bold', fontsize=14)
+                self.ax[index].xaxis.set_label_text('Wavelength (nm)', fontweight='bold', fontsize=fontsize)
+                self.ax[index].set_ylabel(r'|$\delta \rho$|', fontweight='bold', fontsize=fontsize)
                 self.ax[index].xaxis.set_tick_params(which='minor', width=1, length=5)
                 self.ax[index].xaxis.set_tick_params(which='major', width=1, length=10)
                 
                 self.init_segments = [column_stack([self.energy_ev, full(shape=len(self.energy_ev), fill_value=1,
-                                                                     dtype=float16)])]
+                                                                     dtype=float64)])]
                 lincoll = LineCollection(segments=self.init_segments, linewidths=1.5, linestyles='solid',
-                                                         cmap=cm.get_cmap(self.cmap))
+                                                         cmap=self.cmap)
                 self.data_segments.append(lincoll)
                 
-                self.axis_collections.append(self.ax[index].add_collection(self.data_segments[index]))
+                # limits are set explicitly, the placeholder line must not autoscale them
+                self.axis_collections.append(self.ax[index].add_collection(self.data_segments[index], autolim=False))
                 index = index+1
         
         # Setting titles for the single line plots only
         # [self.ax[j].set_title(self.sample_names[i], y = 0.9,) for i,j in enumerate(range(0, self.no_of_plots*2,2))]
+        if samples_per_row > 1:
+            [self.ax[2*i].set_title(str(self.sample_names[i]), fontsize=fontsize) for i in range(self.no_of_plots)]
         
         # Colorbar for multiple line plots only
-        [self.data_segments[j].set_array(self.diffdata_list[i].index.to_numpy()[::self.time_step]) for i,j in
-         enumerate(range(1, self.no_of_plots*2, 2))]
+        [self.data_segments[j].set_array(self.line_times[i]) for i,j in enumerate(range(1, self.no_of_plots*2, 2))]
         # [self.data_segments[j].set_array(self.thickness_list[i].iloc[:,1].values[::self.thickness_step]) for i,j in
         #  enumerate(range(1, self.no_of_plots*2, 2))]
 
@@ -117,49 +205,117 @@ class Plotting:
 
 
 
-        self.time_slider = Slider(axtime, label='', valmin=0, valmax=max_slider_val,
-          valinit=0, valfmt='%d', valstep=self.time_step)
+        self.slider_mode = slider_mode
+        if slider_mode == 'time':
+            start = min(i[0] for i in self.time_list)
+            self.time_slider = Slider(axtime, label='min', valmin=start, valmax=max(i[-1] for i in self.time_list),
+              valinit=start, valfmt='%0.2f')
+        else:
+            self.time_slider = Slider(axtime, label='', valmin=0, valmax=max_slider_val,
+              valinit=0, valfmt='%d', valstep=self.time_step)
+        # draw_data renders the figure itself, see render
+        self.time_slider.drawon = False
+        
+        self.blit = blit and self.fig.canvas.supports_blit
+        if blit and not self.blit:
+            print('Backend cannot blit, using full redraws')
         
+        self.backgrounds = None
+        if self.blit:
+            # animated artists are left out of full draws and drawn over the cached backgrounds
+            [i.set_animated(True) for i in self.data_segments]
+            self.textvar.set_animated(True)
+            axtime.set_animated(True)
+            self.fig.canvas.mpl_connect('draw_event', self.on_draw)
         
-        self.draw_data()
-        self.time_slider.on_changed(self.draw_data)
+        self.profiler = profiler
+        if profiler:
+            # before the callbacks are connected, so that they are the timed methods
+            profiler.instrument(self)
+        
+        self.trends = trends
+        if trends:
+            self.add_trend_axis(trends)
+        
+        self.draw_data(self.time_slider.val) if slider_mode == 'time' else self.draw_data()
+        if max_fps:
+            self.scheduler = RedrawScheduler(self.fig.canvas, self.draw_data, max_fps)
+            self.time_slider.on_changed(self.scheduler.submit)
+            self.fig.canvas.mpl_connect('close_event', lambda event: print('Slider events:', self.scheduler.stats()))
+        else:
+            self.scheduler = None
+            self.time_slider.on_changed(self.draw_data)
         
 
         # Adding radio buttons
         rax = self.fig.add_axes([0.025, 0.05, 0.15, 0.1], facecolor=axcolor)
         self.radiobutton = RadioButtons(rax, ('Linear', 'SemiLogY', 'SemiLogX', 'LogLog'), active=0)
         self.radiobutton.on_clicked(self.axes_func)
+        # (x scale, y scale) set on each axis, None until the first click
+        self.axes_scales = [(None, None)]*len(self.ax)
+        
+        vax = self.fig.add_axes([0.89, 0.05, 0.09, 0.1], facecolor=axcolor)
+        vax.set_title('View', fontsize=10)
+        self.viewbutton = RadioButtons(vax, ('Lines', 'Heatmap'), active=0)
+        self.viewbutton.on_clicked(self.view_func)
         
         print(self.radiobutton.value_selected)
 
     def draw_data(self, slider_value='1'):
-        rows = int(slider_value)
+        if self.slider_mode == 'time':
+            # rows of each sample up to the slider time, at least the first one
+            shown_time = float(slider_value)
+            sample_rows = maximum([rows_at(i, shown_time) for i in self.time_list], 1)
+            rows = None
+        else:
+            rows = int(slider_value)
+            sample_rows = full(self.no_of_plots, rows)
+        
         if rows == 0 or rows == -1:
             [i.set_segments(self.init_segments) for i in self.data_segments]
+            [self.data_segments[2*i+1].set_array(self.line_times[i]) for i in range(self.no_of_plots) if
+             self.drawn_lines[i] == -1]
+            self.drawn_lines = [0]*self.no_of_plots
+            if self.trends:
+                self.trend_cursor.set_xdata([self.time_list[0][0]]*2)
             # reset all graphs
             
         else:
-            idx = 0
+            # row shown by each sample, clipped to the last one for the samples shorter than rows,
+            # as plotting single lines beyond the len of the dataframe throws an error
+            shown_rows = minimum(sample_rows, self.sizelist) - 1
+
+            # one set_segments per axes, as each sample has its own axes. These updates are a few ms per tick
+            # even with 12 samples; drawing the collections in render is nearly all the cost.
             for i in range(self.no_of_plots):
                
-                multiplesegments = [column_stack([self.energy_ev, absolute(row)]) for row in
-                            self.diffdata_list[i].iloc[:rows:self.time_step].values]
-                self.data_segments[idx+1].set_segments(multiplesegments)
-                
-                if rows > self.sizelist[i]:
-                    # if rows is greater than the len of the dataframe, plotting single
-                    # lines throws an error
-                    singlesegments = [
-                        column_stack([self.energy_ev, absolute(self.diffdata_list[i].iloc[self.sizelist[i] - 1].values)])]
-                    self.data_segments[idx].set_segments(singlesegments)
-                    idx = idx + 2
-                
+                if self.view == 'Heatmap':
+                    self.cursors[i].set_ydata([self.time_list[i][shown_rows[i]]]*2)
+                    
+                elif self.max_lines and self.no_of_lines(i, sample_rows[i]) > self.max_lines:
+                    self.draw_lod_lines(i, self.data_segments[2*i+1], sample_rows[i])
+                    
+                elif self.incremental:
+                    self.update_cumulative_lines(i, self.data_segments[2*i+1], sample_rows[i])
                 else:
-                    singlesegments = [column_stack([self.energy_ev, absolute(self.diffdata_list[i].iloc[rows-1].values)])]
-                    self.data_segments[idx].set_segments(singlesegments)
-                    idx = idx+2
-                    Artist.remove(self.textvar)
-                    self.textvar = self.fig.text(x = 0.3, y = 0.85, s = 't = %0.2f min'%(self.time_list[i][rows-1]), fontsize = 15)
+                    if self.drawn_lines[i] == -1:
+                        self.data_segments[2*i+1].set_array(self.line_times[i])
+                        self.drawn_lines[i] = 0
+                    multiplesegments = self.caches[i].rows(0, sample_rows[i], self.time_step)
+                    self.data_segments[2*i+1].set_segments(multiplesegments)
+                
+                self.data_segments[2*i].set_segments([self.row_segment(i, shown_rows[i])])
+            
+            if self.slider_mode != 'time':
+                # time of the last sample which has the row
+                in_range = flatnonzero(shown_rows == rows - 1)
+                shown_time = self.time_list[in_range[-1]][rows-1] if len(in_range) else None
+            
+            if shown_time is not None:
+                self.textvar.set_text('t = %0.2f min'%(shown_time))
+                if self.trends:
+                    # at the time of the label
+                    self.trend_cursor.set_xdata([shown_time]*2)
 
         
             # For confirming sync between diff_rpp_rss, thickness and Slider value
@@ -168,91 +324,365 @@ class Plotting:
             #       round(self.thickness_list[self.no_of_plots-1].iloc[:, 0].values[:rows:self.thickness_step][-1], 3),
             #       round(self.thickness_list[self.no_of_plots-1].iloc[:, 1].values[:rows:self.thickness_step][-1], 1))
 
-            
-    
+        self.render()
+
+    def blit_regions(self):
+        """
+        
+        :return: list of (bbox in display coords, artists redrawn in it)
+        """
+        regions = [(self.ax[i].bbox, [self.data_segments[i]]) for i in range(self.no_of_plots*2)]
+        [regions[2*i+1][1].append(self.cursors[i]) for i in range(self.no_of_plots) if self.cursors[i] is not None]
+        if self.trends:
+            regions.append((self.trend_ax.bbox, [self.trend_cursor]))
+        if self.profiler is not None and self.profiler.text is not None:
+            # the top left corner taken by the overlay of the profiler
+            regions.append((Bbox.from_extents(0, 0.86*self.fig.bbox.height, 0.35*self.fig.bbox.width,
+                                              self.fig.bbox.height), [self.profiler.text]))
+        
+        # the time label changes its width, so taking a fixed box around it
+        height = self.textvar.get_fontsize()*self.fig.dpi/72
+        x0, y0 = self.fig.transFigure.transform((self.textvar.get_position()))
+        regions.append((Bbox.from_extents(x0, y0 - 0.5*height, x0 + 0.4*self.fig.bbox.width, y0 + 1.5*height),
+                        [self.textvar]))
+        
+        # the slider value is written to the right of the slider axes
+        axtime = self.time_slider.ax
+        regions.append((Bbox.from_extents(axtime.bbox.x0, axtime.bbox.y0, self.fig.bbox.x1, axtime.bbox.y1), [axtime]))
+        
+        return regions
+
+    def on_draw(self, event):
+        """
+        Caches the static background of each region after a full draw, e.g. the first one, a radio button
+        click or a resize, and draws the animated artists over it.
+        """
+        canvas = self.fig.canvas
+        self.backgrounds = [(canvas.copy_from_bbox(bbox), bbox, artists) for bbox, artists in self.blit_regions()]
+        [self.fig.draw_artist(j) for _, _, artists in self.backgrounds for j in artists]
+
+    def render(self):
+        """
+        Shows the updated lines: blits them over the cached backgrounds, or asks for a full redraw.
+        """
+        canvas = self.fig.canvas
+        if not self.blit or self.backgrounds is None:
+            canvas.draw_idle()
+            return
+        
+        # the regions overlap (the time label is over the axes), so restoring all of them before drawing
+        [canvas.restore_region(background) for background, _, _ in self.backgrounds]
+        [self.fig.draw_artist(j) for _, _, artists in self.backgrounds for j in artists]
+        [canvas.blit(bbox) for _, bbox, _ in self.backgrounds]
+        canvas.flush_events()
+
+    def row_segment(self, i, row):
+        """
+        
+        :param i: index of the sample
+        :param row: row of the sample's data
+        :return: (energies, 2) array of the line for |delrho| at that row
+        """
+        return self.caches[i].row(row)
+
+    def no_of_lines(self, i, rows):
+        """
+        
+        :return: no of lines of iloc[:rows:time_step] for sample i
+        """
+        return len(range(0, min(rows, self.sizelist[i]), self.time_step))
+
+    def draw_lod_lines(self, i, collection, rows):
+        """
+        Draws at most max_lines of the lines of iloc[:rows:time_step], each with at most max_points points.
+        The cost does not depend on rows.
+        
+        :param i: index of the sample
+        :param collection: LineCollection of the cumulative plot
+        :param rows: no of rows of the sample up to the slider value
+        :return: None
+        """
+        n_lines = self.no_of_lines(i, rows)
+        weights = None if self.row_changes is None else self.row_changes[i].view[:n_lines*self.time_step:self.time_step]
+        lines = select_lines(n_lines, self.max_lines, weights)
+        
+        magnitudes = self.caches[i].magnitudes(lines*self.time_step)
+        collection.set_segments(minmax_downsample(self.caches[i].energy_ev, magnitudes,
+                                                  self.max_points or magnitudes.shape[1]))
+        collection.set_array(self.line_times[i][lines])
+        self.drawn_lines[i] = -1
+
+    def append_rows(self, i, times, values):
+        """
+        Adds rows arriving during a live run to sample i and refreshes the plots.
+        The slider range grows with the longest sample, and a slider sitting at its end follows the new rows.
+        
+        :param i: index of the sample
+        :param times: 1D array of the times of the new rows
+        :param values: 2D (rows, energies) array of the new rows
+        :return: None
+        """
+        if len(times) == 0:
+            return
+        
+        new_times, new_values = self.reserve_rows(i, len(times))
+        new_times[:] = times
+        if iscomplexobj(new_values):
+            new_values[:] = values
+        else:
+            # data loaded as magnitudes
+            absolute(values, out=new_values)
+        self.commit_rows(i, len(times))
     
+    def reserve_rows(self, i, n_rows):
+        """
+        Room for n_rows new rows of sample i in its buffers, for a reader copying them in place once
+        (see shm_transport). commit_rows then adds them.
+        
+        :return: times view, values view, of n_rows rows
+        """
+        if self.buffers[i] is None:
+            self.buffers[i] = (RowBuffer.from_array(self.time_list[i]), RowBuffer.from_array(self.values_list[i]))
+        time_buffer, value_buffer = self.buffers[i]
+        
+        return time_buffer.reserve(n_rows), value_buffer.reserve(n_rows)
     
-    def axes_func(self, label='Linear'):
-        if label == 'SemiLogY':
-            print(self.radiobutton.value_selected)
-            
-            [i.remove() for i in self.axis_collections]
-            self.axis_collections.clear()
-            [self.axis_collections.append(self.ax[i].add_collection(self.data_segments[i])) for i in range(
-                self.no_of_plots*2)]
+    def commit_rows(self, i, n_rows):
+        """
+        Adds the first n_rows rows written in the views of reserve_rows to sample i and refreshes the plots.
+        """
+        if n_rows == 0:
+            return
+        
+        time_buffer, value_buffer = self.buffers[i]
+        time_buffer.commit(n_rows)
+        value_buffer.commit(n_rows)
+        
+        old_size = self.sizelist[i]
+        self.time_list[i] = time_buffer.view
+        self.values_list[i] = value_buffer.view
+        self.sizelist[i] = len(time_buffer)
+        self.line_times[i] = self.time_list[i][::self.time_step]
+        self.caches[i].append(self.values_list[i])
+        if self.trends:
+            self.metrics[i].append(self.values_list[i])
+            self.update_trends(i)
+        if self.row_changes is not None:
+            self.row_changes[i].append(line_changes(self.values_list[i][old_size - 1:])[1:])
+        
+        # colours of the cumulative plot and y limits
+        cumulative = self.data_segments[2*i + 1]
+        if self.drawn_lines[i] != -1:
+            cumulative.set_array(self.line_times[i])
+        cumulative.set_clim(self.line_times[i][0], self.line_times[i][-1])
+        self.grow_y_lim(i, self.caches[i].abs_max)
+        
+        if self.heatmaps[i] is not None:
+            self.heatmaps[i].remove()
+            self.heatmaps[i] = None
+            if self.view == 'Heatmap':
+                self.show_heatmap(i, True)
+        
+        # slider range
+        following = self.time_slider.val >= self.time_slider.valmax
+        self.max_slider_val = max(self.max_slider_val, max(self.sizelist))
+        if self.slider_mode == 'time':
+            self.time_slider.valmax = max(j[-1] for j in self.time_list)
+        else:
+            self.time_slider.valmax = self.max_slider_val
+        self.time_slider.ax.set_xlim(self.time_slider.valmin, self.time_slider.valmax)
+        if following:
+            self.time_slider.set_val(self.time_slider.valmax)
+        
+        # colorbar, limits and slider are not blitted
+        self.fig.canvas.draw_idle()
+
+    def add_trend_axis(self, trends):
+        """
+        Panel of the summary metrics of each sample against time, under the sample plots.
+        
+        :param trends: names of the metrics to plot
+        :return: None
+        """
+        self.metrics = [SummaryMetrics(self.values_list[i], self.energy_ev) for i in range(self.no_of_plots)]
+        
+        self.trend_ax = self.fig.add_axes([0.2, 0.13, 0.65, 0.13])
+        self.trend_ax.set_xlabel('time (min)', fontweight='bold', fontsize=12)
+        self.trend_ax.set_ylabel('normalised', fontsize=12)
+        
+        # lines of each sample, in the order of trends
+        self.trend_lines = [[self.trend_ax.plot([], [], label='%s %s' % (self.sample_names[i], name))[0] for name in
+                             trends] for i in range(self.no_of_plots)]
+        [self.update_trends(i) for i in range(self.no_of_plots)]
+        # at most 4 rows of legend
+        self.trend_ax.legend(fontsize=8, loc='upper left', ncol=ceil(len(trends)*self.no_of_plots/4))
+        
+        self.trend_cursor = self.trend_ax.axvline(x=self.time_list[0][0], color='k', linewidth=1, linestyle='--',
+                                                  animated=self.blit)
+
+    def update_trends(self, i):
+        """
+        Sets the trend lines of sample i from its metrics and fits the time axis of the panel.
+        """
+        for name, line in zip(self.trends, self.trend_lines[i]):
+            metric = self.metrics[i].metric(name)
+            scale = absolute(metric).max() if len(metric) else 0
+            line.set_data(self.time_list[i], metric/scale if scale else metric)
+        
+        self.trend_ax.set_xlim(min(j[0] for j in self.time_list), max(j[-1] for j in self.time_list))
+        self.trend_ax.set_ylim(-0.05, 1.05)
+
+    def grow_y_lim(self, i, y_max):
+        """
+        Raises the upper y limit of sample i to y_max, e.g. for rows appended or for the max of |delrho| of a lazy
+        dataset growing as it is read (see lazy_dataset.watch_stats). The figure is not redrawn.
+        
+        :return: True if the limit was raised
+        """
+        if y_max <= self.y_lim[i][1]:
+            return False
+        
+        self.caches[i].abs_max = max(self.caches[i].abs_max, y_max)
+        self.y_lim[i] = (self.y_lim[i][0], y_max)
+        self.set_ax_limits([2*i, 2*i + 1])
+        return True
+
+    def view_func(self, label='Lines'):
+        print(label)
+        self.view = label
+        
+        [self.show_heatmap(i, label == 'Heatmap') for i in range(self.no_of_plots)]
+        self.axes_properties(scale=self.radiobutton.value_selected)
+        
+        # bringing the lines or the cursors to the slider position
+        self.draw_data(self.time_slider.val)
+        self.fig.canvas.draw_idle()
+
+    def show_heatmap(self, i, heatmap = True):
+        """
+        Shows the heatmap of sample i, or its lines, in the cumulative plot.
+        
+        :param i: index of the sample
+        :param heatmap: True for the heatmap, False for the lines
+        :return: None
+        """
+        ax = self.ax[2*i+1]
+        
+        if heatmap and self.heatmaps[i] is None:
+            magnitudes = self.caches[i].magnitudes(slice(None))
+            self.heatmaps[i] = ax.pcolormesh(self.energy_ev, self.time_list[i], magnitudes, shading='nearest',
+                                             cmap='viridis', norm=Normalize(vmin=0, vmax=self.y_lim[i][1]))
+            if self.cursors[i] is None:
+                self.cursors[i] = ax.axhline(y=self.time_list[i][0], color='w', linewidth=1.5, linestyle='--',
+                                             animated=self.blit)
+        
+        if self.heatmaps[i] is not None:
+            self.heatmaps[i].set_visible(heatmap)
+        if self.cursors[i] is not None:
+            self.cursors[i].set_visible(heatmap)
+        self.data_segments[2*i+1].set_visible(not heatmap)
+        
+        self.cbar[i].update_normal(self.heatmaps[i] if heatmap else self.data_segments[2*i+1])
+        self.cbar[i].set_label(r'|$\delta \rho$|' if heatmap else 'time (min)')
+        ax.set_ylabel('time (min)' if heatmap else r'|$\delta \rho$|', fontweight='bold', fontsize=14)
+
+    def heatmap_properties(self, scale='Linear'):
+        """
+        Time is on the y axis, see axes_properties, and the log scales of |delrho| go to the colours.
+        """
+        for i in range(self.no_of_plots):
+            self.ax[2*i+1].set_xlim(self.x_lim[0], self.x_lim[1])
+            self.ax[2*i+1].set_ylim(self.time_list[i][0], self.time_list[i][-1])
             
-            self.axes_properties(scale=label)
-            self.fig.canvas.draw_idle()
-            # If this is not used, then the plot is not update until the slider value is changed
+            if scale == 'SemiLogY' or scale == 'LogLog':
+                norm = LogNorm(vmin=self.y_lim[i][0], vmax=self.y_lim[i][1])
+            else:
+                norm = Normalize(vmin=0, vmax=self.y_lim[i][1])
+            self.heatmaps[i].set_norm(norm)
+            self.cbar[i].update_normal(self.heatmaps[i])
+
+    def update_cumulative_lines(self, i, collection, rows):
+        """
+        Brings the cumulative plot of sample i to the lines of iloc[:rows:time_step] by appending or
+        truncating only the lines between the previous and the new slider position.
+        The paths list of the LineCollection is edited in place, as set_segments rebuilds every path.
+        
+        :param i: index of the sample
+        :param collection: LineCollection of the cumulative plot
+        :param rows: no of rows of the sample up to the slider value
+        :return: None
+        """
+        new_lines = self.no_of_lines(i, rows)
+        old_lines = self.drawn_lines[i]
+        paths = collection.get_paths()
+        
+        if old_lines == -1:
+            # coming back from a level of detail subset
+            collection.set_array(self.line_times[i])
+            old_lines = 0
+        
+        if old_lines == 0:
+            # removing the placeholder line of init_segments
+            del paths[:]
+        
+        if new_lines > old_lines:
+            paths.extend([Path(self.row_segment(i, line*self.time_step)) for line in range(old_lines, new_lines)])
+        else:
+            del paths[new_lines:]
+        
+        collection.stale = True
+        self.drawn_lines[i] = new_lines
     
-        elif label == 'SemiLogX':
-            print(self.radiobutton.value_selected)
-            
-            [i.remove() for i in self.axis_collections]
-            self.axis_collections.clear()
-            [self.axis_collections.append(self.ax[i].add_collection(self.data_segments[i])) for i in range(
-                self.no_of_plots * 2)]
-            
-            self.axes_properties(scale=label)
-            self.fig.canvas.draw_idle()
     
     
-        elif label == 'LogLog':
-            print(self.radiobutton.value_selected)
-            
-            [i.remove() for i in self.axis_collections]
-            self.axis_collections.clear()
-            [self.axis_collections.append(self.ax[i].add_collection(self.data_segments[i])) for i in range(
-                self.no_of_plots * 2)]
+    def axes_func(self, label='Linear'):
+        print(self.radiobutton.value_selected)
+        
+        # the collections stay on their axes, only the scales which change are set
+        self.axes_properties(scale=label)
+        self.fig.canvas.draw_idle()
+        # If this is not used, then the plot is not update until the slider value is changed
+
+    def axes_properties(self, scale='Linear'):
+        
+        xscale = 'log' if scale == 'SemiLogX' or scale == 'LogLog' else 'linear'
+        yscale = 'linear' if scale == 'Linear' or scale == 'SemiLogX' else 'log'
+        
+        changed = []
+        for index, ax in enumerate(self.ax):
+            # time is on the y axis of the heatmaps
+            ax_yscale = 'linear' if self.view == 'Heatmap' and index % 2 == 1 else yscale
             
-            self.axes_properties(scale=label)
-            self.fig.canvas.draw_idle()
-    
-        else:
-            print(self.radiobutton.value_selected)
+            if self.axes_scales[index] == (xscale, ax_yscale):
+                continue
             
-            [i.remove() for i in self.axis_collections]
-            self.axis_collections.clear()
-            [self.axis_collections.append(self.ax[i].add_collection(self.data_segments[i])) for i in range(
-                self.no_of_plots * 2)]
+            if self.axes_scales[index][0] != xscale:
+                ax.set_xscale(value=xscale)
+                ax.xaxis.set_minor_locator(self.logminorlocator if xscale == 'log' else self.minorlocator)
+            if self.axes_scales[index][1] != ax_yscale:
+                ax.set_yscale(value=ax_yscale)
             
-            self.axes_properties(scale=label)
-            self.fig.canvas.draw_idle()
-
-    def axes_properties(self, scale='Linear'):
-    
-        if scale == 'Linear':
-            [i.set_xscale(value='linear') for i in self.ax]
-            [i.set_yscale(value='linear') for i in self.ax]
-            [i.xaxis.set_minor_locator(self.minorlocator) for i in self.ax]
-            self.set_ax_limits()
-    
-        elif scale == 'SemiLogX' or scale == 'LogLog':
-            # ax.cla()
-            [i.set_xscale(value='log') for i in self.ax]
+            self.axes_scales[index] = (xscale, ax_yscale)
+            changed.append(index)
         
-            if scale == 'LogLog':
-                [i.set_yscale(value='log') for i in self.ax]
-            else:
-                [i.set_yscale(value='linear') for i in self.ax]
-            [i.xaxis.set_minor_locator(self.logminorlocator) for i in self.ax]
-            self.set_ax_limits()
-    
-    
-        else:
-            [i.set_xscale(value='linear') for i in self.ax]
-            [i.set_yscale(value='log') for i in self.ax]
-            [i.xaxis.set_minor_locator(self.minorlocator) for i in self.ax]
-            self.set_ax_limits()
-
-    def set_ax_limits(self):
-        [i.set_xlim(auto=True, xmin=self.x_lim[0], xmax=self.x_lim[1]) for i in self.ax]
+        # changing a scale autoscales the axis
+        self.set_ax_limits(changed)
         
-        idx=0
-        for i in range(self.no_of_plots):
-            self.ax[idx].set_ylim(auto=True, ymin=self.y_lim[i][0], ymax=self.y_lim[i][1])
-            self.ax[idx+1].set_ylim(auto=True, ymin=self.y_lim[i][0], ymax=self.y_lim[i][1])
-            idx = idx+2
+    def set_ax_limits(self, indices = None):
+        """
+        
+        :param indices: indices of the axes to set, all by default
+        """
+        indices = range(len(self.ax)) if indices is None else indices
+        
+        for index in indices:
+            # 2 axes per sample
+            i = index//2
+            self.ax[index].set_xlim(auto=True, xmin=self.x_lim[0], xmax=self.x_lim[1])
+            self.ax[index].set_ylim(auto=True, ymin=self.y_lim[i][0], ymax=self.y_lim[i][1])
+        
+        if self.view == 'Heatmap':
+            self.heatmap_properties(scale=self.radiobutton.value_selected)
 
 
             
@@ -272,8 +702,12 @@ if __name__=='__main__':
     AlGaAs = ['/home/sameer/Ellipsometer_data/Data/Sameer/Sameer/RDA/Woollam_simulations/AlGaAs/']
     
     test_folders = IsoOrg
+    # or chosen among the runs of the catalog, see run_catalog
+    # from run_catalog import choose_directories
+    # test_folders = choose_directories('/home/sameer/Ellipsometer_data/Data/Sameer/Sameer/RDA/', 1, choice='selected_')
 
-    diffdata_list, sample_list, max_slider_val = load_data(choice='selected_',directories=test_folders)
+    diffdata_list, sample_list, max_slider_val = load_data(choice='selected_',directories=test_folders,
+                                                           container='dataset')
 
     time_step = 1
     
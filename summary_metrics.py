@@ -0,0 +1,95 @@
+from numpy import absolute, argmax, arange, asarray, diff, empty, float64
+
+from row_buffer import RowBuffer
+
+"""
+Metrics of each time row of a sample, to follow how the run evolves without overlaying the spectra:
+    integrated      integral of |delrho| over the energy axis (trapezoidal)
+    peak_energy     energy of the maximum of |delrho|
+    peak_magnitude  maximum of |delrho|
+    change          change from the previous row, sum(||row| - |previous row||) as in lod.line_changes
+All of them come from one pass over |delrho|, block by block.
+"""
+
+METRICS = ('integrated', 'peak_energy', 'peak_magnitude', 'change')
+
+
+def row_metrics(values, energy_ev, block_rows = 1024):
+    """
+
+    :param values: 2D (times, energies) complex array
+    :param energy_ev: energy axis of the rows
+    :param block_rows: no of rows to take at a time
+    :return: (times, len(METRICS)) array, the change of the first row being 0
+    """
+    energy_ev = asarray(energy_ev, dtype=float64)
+    # half widths of the trapezoids, positive whichever the order of the energies
+    widths = absolute(diff(energy_ev))/2
+    metrics = empty((len(values), len(METRICS)), dtype=float64)
+
+    for start in range(0, len(values), block_rows):
+        # one row of overlap with the previous block for the change
+        first = max(start - 1, 0)
+        magnitudes = absolute(values[first:start + block_rows])
+        block = magnitudes[start - first:]
+        stop = start + len(block)
+
+        metrics[start:stop, 0] = (block[:, 1:] + block[:, :-1]) @ widths
+        peaks = argmax(block, axis=1)
+        metrics[start:stop, 1] = energy_ev[peaks]
+        metrics[start:stop, 2] = block[arange(len(block)), peaks]
+        metrics[first + 1:stop, 3] = absolute(diff(magnitudes, axis=0)).sum(axis=1)
+
+    if len(values):
+        metrics[0, 3] = 0.0
+
+    return metrics
+
+
+class SummaryMetrics:
+
+    """
+    Metrics of every row of one sample, kept up to date as rows are appended during a live run.
+
+    """
+
+    def __init__(self, values, energy_ev, block_rows = 1024):
+        """
+
+        :param values: 2D (times, energies) complex array of the sample
+        :param energy_ev: energy axis of the rows
+        :param block_rows: no of rows to take at a time
+        """
+        self.values = values
+        self.energy_ev = energy_ev
+        self.block_rows = block_rows
+        self.buffer = RowBuffer.from_array(row_metrics(values, energy_ev, block_rows))
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def append(self, values):
+        """
+        Computes the metrics of the rows added at the end of the data only.
+
+        :param values: the whole grown data, whose first len(self) rows are the ones already known
+        :return: None
+        """
+        old_size = len(self.values)
+        self.values = values
+        if len(values) == old_size:
+            return
+
+        if old_size == 0:
+            self.buffer.append(row_metrics(values, self.energy_ev, self.block_rows))
+        else:
+            # from the last known row, for the change of the first new one
+            self.buffer.append(row_metrics(values[old_size - 1:], self.energy_ev, self.block_rows)[1:])
+
+    def metric(self, name):
+        """
+
+        :param name: one of METRICS
+        :return: view of the metric for every row
+        """
+        return self.buffer.view[:, METRICS.index(name)]
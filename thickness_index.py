@@ -0,0 +1,57 @@
+from numpy import argsort, asarray, clip, float64, searchsorted, where
+
+"""
+Lookup of the rows of a sample by thickness, for the thickness slider of single_multiplelines_plotting_v2.
+"""
+
+
+class ThicknessIndex:
+
+    """
+    Thicknesses of the rows of one sample sorted once, so that the row at a thickness is a binary search.
+    The thicknesses of a run normally grow with time, but are sorted anyway in case of fitting noise.
+
+    """
+
+    def __init__(self, thicknesses):
+        """
+
+        :param thicknesses: 1D array of the thickness of each row, e.g. times_thicknesses.iloc[:, 1].values
+        """
+        thicknesses = asarray(thicknesses, dtype=float64)
+        self.rows = argsort(thicknesses, kind='stable')
+        self.thicknesses = thicknesses[self.rows]
+
+    def __len__(self):
+        return len(self.thicknesses)
+
+    def nearest(self, thickness):
+        """
+
+        :param thickness: thickness or array of thicknesses
+        :return: row or array of rows of the closest thickness, the first or last row outside the run
+        """
+        if len(self) == 1:
+            return self.rows[0]
+
+        after = clip(searchsorted(self.thicknesses, thickness), 1, len(self) - 1)
+        closer_before = abs(thickness - self.thicknesses[after - 1]) <= abs(self.thicknesses[after] - thickness)
+
+        return self.rows[where(closer_before, after - 1, after)]
+
+    def bracket(self, thickness):
+        """
+        Rows either side of a thickness, for interpolating between them.
+
+        :param thickness: thickness or array of thicknesses
+        :return: row before, row after and weight of the row after, clamped to the run
+        """
+        if len(self) == 1:
+            return self.rows[0], self.rows[0], 0.0
+
+        after = clip(searchsorted(self.thicknesses, thickness, side='right'), 1, len(self) - 1)
+        before_thickness, after_thickness = self.thicknesses[after - 1], self.thicknesses[after]
+        span = after_thickness - before_thickness
+        weight = clip(where(span > 0, (thickness - before_thickness)/where(span > 0, span, 1), 0), 0, 1)
+
+        return self.rows[after - 1], self.rows[after], weight
@@ -0,0 +1,96 @@
+from numpy import asarray, clip, empty, float64, linspace, median, diff, searchsorted, where
+
+from dart_dataset import DartDataset
+
+"""
+Lining up samples by time rather than by row: the rows of each sample up to a given time, found by binary search
+on its sorted times, and the interpolation of the samples onto one time grid.
+"""
+
+
+def rows_at(times, t):
+    """
+
+    :param times: sorted 1D array of the times of a sample
+    :param t: time or array of times
+    :return: no of rows at or before t
+    """
+    return searchsorted(times, t, side='right')
+
+
+def common_grid(time_list, n_points = None):
+    """
+    Evenly spaced times over the span common to all the samples, so that no sample is extrapolated.
+
+    :param time_list: list of sorted 1D arrays of times
+    :param n_points: no of times, by default as many as the median time step of the samples gives
+    :return: 1D array of times
+    """
+    start = max(times[0] for times in time_list)
+    stop = min(times[-1] for times in time_list)
+    if stop < start:
+        raise ValueError('The samples do not overlap in time')
+
+    if n_points is None:
+        step = median([median(diff(times)) for times in time_list if len(times) > 1])
+        n_points = int(round((stop - start)/step)) + 1 if step > 0 else 1
+
+    return linspace(start, stop, n_points)
+
+
+def interpolate_rows(times, values, grid, block_rows = 1024):
+    """
+    Linear interpolation in time of every energy at once, block by block of the grid.
+
+    :param times: sorted 1D array of the times of the rows
+    :param values: 2D (times, energies) array
+    :param grid: 1D array of times within times[0] and times[-1]
+    :param block_rows: no of grid times to take at a time
+    :return: 2D (grid, energies) array
+    """
+    times = asarray(times, dtype=float64)
+    out = empty((len(grid), values.shape[1]), dtype=values.dtype)
+    if len(times) == 1:
+        out[:] = values[0]
+        return out
+
+    for start in range(0, len(grid), block_rows):
+        block = grid[start:start + block_rows]
+        # rows either side of each grid time
+        after = clip(searchsorted(times, block, side='right'), 1, len(times) - 1)
+        span = times[after] - times[after - 1]
+        # repeated times take the first of the two rows
+        weight = where(span > 0, (block - times[after - 1])/where(span > 0, span, 1), 0)[:, None]
+        out[start:start + len(block)] = values[after - 1]*(1 - weight) + values[after]*weight
+
+    return out
+
+
+def align_data(diffdata_list, grid = None):
+    """
+    Interpolates the samples returned by load_data onto a common time grid, once, so that the same row of
+    every sample is the same time.
+
+    :param diffdata_list: list of DataFrames or DartDatasets indexed by time
+    :param grid: 1D array of times, common_grid of the samples by default
+    :return: list of the same containers on the grid
+    """
+    time_list = [asarray(i.index, dtype=float64) for i in diffdata_list]
+    grid = common_grid(time_list) if grid is None else asarray(grid, dtype=float64)
+
+    aligned = []
+    for times, diff_rpp_rss in zip(time_list, diffdata_list):
+        values = interpolate_rows(times, diff_rpp_rss.values, grid)
+        if isinstance(diff_rpp_rss, DartDataset):
+            aligned.append(DartDataset(values, grid, diff_rpp_rss.columns, diff_rpp_rss.index_name,
+                                       dict(diff_rpp_rss.attrs)))
+            continue
+
+        import pandas as pd
+        aligned_data = pd.DataFrame(data=values, index=grid, columns=diff_rpp_rss.columns)
+        aligned_data.index.name = diff_rpp_rss.index.name
+        aligned.append(aligned_data)
+
+    print('Aligned %d samples on %d times from %0.2f to %0.2f min' % (len(aligned), len(grid), grid[0], grid[-1]))
+
+    return aligned